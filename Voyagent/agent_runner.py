@@ -4,21 +4,22 @@ import logging
 import time
 import asyncio
 from dotenv import load_dotenv
+
+# Load environment variables before the tool modules read them at import
+load_dotenv()
+
 # Import the correct modules
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_google_genai import ChatGoogleGenerativeAI  # Changed to use Gemini
 
 # Import tool implementations
 from Voyagent.tools.perplexity import PerplexitySearchTool
-from Voyagent.tools.apify import ApifyFlightTool, ApifyPOITool, ApifyGoogleMapsTool
+from Voyagent.tools.apify import ApifyFlightTool, ApifyPOITool, ApifyPOIBatchTool, ApifyGoogleMapsTool
 from Voyagent.tools.deepl import DeepLTranslateTool
 from Voyagent.tools.vapi import VapiReservationTool, VapiCallTool
 from Voyagent.tools.gemini_preprocessor import GeminiPreprocessor
 from Voyagent.cache_manager import save_to_cache, get_from_cache
 
-# Load environment variables
-load_dotenv()
-
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -74,24 +75,93 @@ tools = [
     PerplexitySearchTool(),
     ApifyFlightTool(),
     ApifyPOITool(),
+    ApifyPOIBatchTool(),
     ApifyGoogleMapsTool(),
     DeepLTranslateTool(),
     VapiReservationTool(),
     VapiCallTool()
 ]
 
+# Static transportation comparisons for common routes. The "route" strings are
+# templates filled with the user's origin and destination.
+COMPARISON_ORIGINS = frozenset({"san francisco", "sf", "bay area"})
+COMPARISON_DESTINATIONS = {
+    "yosemite": "yosemite",
+    "yosemite national park": "yosemite",
+    "fresno": "fresno",
+}
+TRANSPORT_COMPARISONS = {
+    "yosemite": {
+        "label": "SF to Yosemite",
+        "comparison": {
+            "driving": {
+                "route": "Driving from {origin} to {destination}",
+                "distance": "170-200 miles depending on route",
+                "duration": "3.5-4.5 hours each way",
+                "cost": "$30-40 in gas (estimated)",
+                "advantages": ["Freedom to explore at your own pace", 
+                              "No need for additional transportation in the park",
+                              "Scenic drive through the Sierra Nevada mountains"],
+                "disadvantages": ["Longer travel time than flying to a nearby airport",
+                                 "Driver fatigue on mountain roads",
+                                 "Seasonal road closures possible (check conditions)"]
+            },
+            "flying": {
+                "route": "Flying from {origin} to Fresno Yosemite International Airport (FAT)",
+                "details": "1-hour flight + 1.5-hour drive from Fresno to Yosemite Valley",
+                "duration": "Total journey: 3.5-4 hours including airport time",
+                "cost": "$120-250 for flight + $60-100 for car rental per day",
+                "advantages": ["Less direct driving time", 
+                              "Good option if you don't enjoy mountain driving"],
+                "disadvantages": ["Still need to rent a car from Fresno",
+                                 "More expensive than driving directly",
+                                 "Less flexibility with flight schedules"]
+            },
+            "recommendation": "For trips to Yosemite from San Francisco, driving is generally the preferred option for most visitors. The drive is scenic, especially as you approach the park, and having your own car gives you maximum flexibility to explore different areas of this large park. Flying to Fresno can make sense if you prefer to minimize driving or if your time is limited."
+        }
+    },
+    "fresno": {
+        "label": "SF to Fresno",
+        "comparison": {
+            "driving": {
+                "route": "Driving from {origin} to {destination}",
+                "distance": "Approximately 190 miles via I-5 S",
+                "duration": "2.5-3 hours",
+                "cost": "$25-35 in gas (estimated)",
+                "advantages": ["No need for airport procedures", 
+                              "Flexible departure time",
+                              "Can bring more luggage"],
+                "disadvantages": ["Driver fatigue", 
+                                 "Traffic possible especially near the Bay Area"]
+            },
+            "flying": {
+                "route": "Flying from SFO to Fresno Yosemite International (FAT)",
+                "details": "Direct flights available on United Airlines",
+                "duration": "Flight time: 1 hour (plus ~2 hours for airport procedures)",
+                "cost": "$120-$220 round trip",
+                "advantages": ["Shorter travel time", 
+                              "Can work or rest during the journey"],
+                "disadvantages": ["Need to arrange ground transportation in Fresno",
+                                 "Airport security lines",
+                                 "Fixed departure times"]
+            },
+            "recommendation": "For travel between San Francisco and Fresno, flying is faster when accounting for total journey time, while driving offers more flexibility and can be more economical especially for groups. The flight is quick (only 1 hour), but you need to factor in time for airport procedures."
+        }
+    }
+}
+
 # Dictionary to store user chat history and context
 user_sessions = {}
 
 # Callback functions for handling telegram updates
 telegram_callbacks = {}
 
+# Tools by name, for constant-time lookup when dispatching
+tools_by_name = {tool.name: tool for tool in tools}
+
 def get_tool_by_name(tool_name):
     """Get a tool instance by its name."""
-    for tool in tools:
-        if tool.name == tool_name:
-            return tool
-    return None
+    return tools_by_name.get(tool_name)
 
 def register_telegram_callback(callback_func):
     """Register a callback function to send updates to Telegram."""
@@ -205,79 +275,22 @@ def process_message(message, user_info):
             transport_modes = structured_query.get("transport_modes", [])
             
             # Use static comparison data for common routes
-            if (origin.lower() in ["san francisco", "sf", "bay area"] and 
-                destination.lower() in ["yosemite", "yosemite national park"]):
-                    
-                comparison_data = {
-                    "comparison": {
-                        "driving": {
-                            "route": f"Driving from {origin} to {destination}",
-                            "distance": "170-200 miles depending on route",
-                            "duration": "3.5-4.5 hours each way",
-                            "cost": "$30-40 in gas (estimated)",
-                            "advantages": ["Freedom to explore at your own pace", 
-                                          "No need for additional transportation in the park",
-                                          "Scenic drive through the Sierra Nevada mountains"],
-                            "disadvantages": ["Longer travel time than flying to a nearby airport",
-                                             "Driver fatigue on mountain roads",
-                                             "Seasonal road closures possible (check conditions)"]
-                        },
-                        "flying": {
-                            "route": f"Flying from {origin} to Fresno Yosemite International Airport (FAT)",
-                            "details": "1-hour flight + 1.5-hour drive from Fresno to Yosemite Valley",
-                            "duration": "Total journey: 3.5-4 hours including airport time",
-                            "cost": "$120-250 for flight + $60-100 for car rental per day",
-                            "advantages": ["Less direct driving time", 
-                                          "Good option if you don't enjoy mountain driving"],
-                            "disadvantages": ["Still need to rent a car from Fresno",
-                                             "More expensive than driving directly",
-                                             "Less flexibility with flight schedules"]
-                        },
-                        "recommendation": "For trips to Yosemite from San Francisco, driving is generally the preferred option for most visitors. The drive is scenic, especially as you approach the park, and having your own car gives you maximum flexibility to explore different areas of this large park. Flying to Fresno can make sense if you prefer to minimize driving or if your time is limited."
-                    }
-                }
-                
-                # Return the comparative data directly
-                tool_to_use = None  # Skip the normal tool use flow
-                tool_response = json.dumps(comparison_data)
-                update_thought_process(user_id, "Retrieved transportation comparison data for SF to Yosemite", replace=True)
+            comparison_route = None
+            if origin.lower() in COMPARISON_ORIGINS:
+                comparison_route = COMPARISON_DESTINATIONS.get(destination.lower())
             
-            # For SF to Fresno
-            elif (origin.lower() in ["san francisco", "sf", "bay area"] and 
-                  destination.lower() == "fresno"):
-                
-                comparison_data = {
-                    "comparison": {
-                        "driving": {
-                            "route": f"Driving from {origin} to {destination}",
-                            "distance": "Approximately 190 miles via I-5 S",
-                            "duration": "2.5-3 hours",
-                            "cost": "$25-35 in gas (estimated)",
-                            "advantages": ["No need for airport procedures", 
-                                          "Flexible departure time",
-                                          "Can bring more luggage"],
-                            "disadvantages": ["Driver fatigue", 
-                                             "Traffic possible especially near the Bay Area"]
-                        },
-                        "flying": {
-                            "route": f"Flying from SFO to Fresno Yosemite International (FAT)",
-                            "details": "Direct flights available on United Airlines",
-                            "duration": "Flight time: 1 hour (plus ~2 hours for airport procedures)",
-                            "cost": "$120-$220 round trip",
-                            "advantages": ["Shorter travel time", 
-                                          "Can work or rest during the journey"],
-                            "disadvantages": ["Need to arrange ground transportation in Fresno",
-                                             "Airport security lines",
-                                             "Fixed departure times"]
-                        },
-                        "recommendation": "For travel between San Francisco and Fresno, flying is faster when accounting for total journey time, while driving offers more flexibility and can be more economical especially for groups. The flight is quick (only 1 hour), but you need to factor in time for airport procedures."
-                    }
-                }
+            if comparison_route:
+                comparison = TRANSPORT_COMPARISONS[comparison_route]
+                comparison_data = {"comparison": {
+                    mode: (dict(details, route=details["route"].format(origin=origin, destination=destination))
+                           if isinstance(details, dict) else details)
+                    for mode, details in comparison["comparison"].items()
+                }}
                 
                 # Return the comparative data directly
                 tool_to_use = None  # Skip the normal tool use flow
                 tool_response = json.dumps(comparison_data)
-                update_thought_process(user_id, "Retrieved transportation comparison data for SF to Fresno", replace=True)
+                update_thought_process(user_id, f"Retrieved transportation comparison data for {comparison['label']}", replace=True)
             
             # For other routes, use Perplexity to get up-to-date info
             else:
@@ -288,6 +301,11 @@ def process_message(message, user_info):
         elif query_type == "poi" or query_type == "recommendations":
             tool_to_use = get_tool_by_name("apify_poi")
             update_thought_process(user_id, "Looking for attractions and points of interest...", replace=True)
+            # Only a list counts; anything else from Gemini takes the single-destination path
+            destinations = structured_query.get("destinations")
+            if not isinstance(destinations, list):
+                destinations = []
+            destinations = [name for name in destinations if isinstance(name, str) and name.strip()]
             
             # For recommendation queries when we have origin but no destination, use Perplexity instead
             if query_type == "recommendations" and structured_query.get("origin") and not structured_query.get("destination"):
@@ -295,6 +313,12 @@ def process_message(message, user_info):
                 tool_to_use = get_tool_by_name("perplexity_search")
                 message = f"Weekend trip destinations from {structured_query.get('origin')} within 3-4 hours by car or short flight"
                 logger.info(f"Reformulated as general search: {message}")
+            # Look up several destinations in one batch call
+            elif len(destinations) > 1:
+                tool_to_use = get_tool_by_name("apify_poi_batch")
+                message = "; ".join(destinations)
+                logger.info(f"Structured POI batch query: {message}")
+                update_thought_process(user_id, f"Finding attractions and things to do in {', '.join(destinations)}...", replace=True)
             # Use the destination for POI search only when we have a specific destination
             elif structured_query.get("destination"):
                 message = structured_query.get("destination")
@@ -318,11 +342,12 @@ def process_message(message, user_info):
                 update_thought_process(user_id, f"Finding directions from {origin} to {destination}...", replace=True)
                 
         # Check for other specific tool needs
-        if "translate" in message.lower() or any(lang in message.lower() for lang in ["spanish", "french", "german", "japanese"]):
+        message_lower = message.lower()
+        if "translate" in message_lower or any(lang in message_lower for lang in ["spanish", "french", "german", "japanese"]):
             tool_to_use = get_tool_by_name("deepl_translate")
             update_thought_process(user_id, "Preparing to translate content...", replace=True)
         
-        elif any(term in message.lower() for term in ["book", "reserve", "reservation", "call"]):
+        elif any(term in message_lower for term in ["book", "reserve", "reservation", "call"]):
             tool_to_use = get_tool_by_name("vapi_reservation")
             update_thought_process(user_id, "Preparing to help you make a reservation...", replace=True)
         
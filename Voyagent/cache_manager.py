@@ -1,6 +1,11 @@
 import os
+import sys
+import copy
 import json
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime
 import re
@@ -14,19 +19,158 @@ CACHE_DIR = Path(__file__).parent / "cache"
 # Ensure cache directory exists
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+# Number of past queries kept in each user's cache file
+try:
+    QUERY_HISTORY_MAX = max(1, int(os.getenv("VOYAGENT_QUERY_HISTORY_MAX", "50")))
+except ValueError:
+    logger.warning(f"Invalid VOYAGENT_QUERY_HISTORY_MAX {os.getenv('VOYAGENT_QUERY_HISTORY_MAX')!r}, using 50")
+    QUERY_HISTORY_MAX = 50
+
+# trip_details lists that are kept free of duplicates
+INDEXED_TRIP_LISTS = ("destinations", "flights", "accommodations", "activities", "reservations", "notes")
+
+# Caches of recently active users, keyed by user ID, with the file stamp they
+# were read or written at so edits made to the file are picked up. Each one
+# carries an "_index" of dedup sets that is never written to disk.
+LOADED_CACHES_MAX = 32
+_loaded_caches = OrderedDict()
+_cache_lock = threading.RLock()
+
+# Number of recent results remembered so that retried queries skip extraction
+RECENT_RESULTS_MAX = 256
+_recent_results = OrderedDict()
+
+# Patterns used when parsing HTML formatted flight results
+_DATE_RE = re.compile(r'(\d{4}-\d{2}-\d{2})')
+_TIME_RE = re.compile(r'(\d{1,2}:\d{2})')
+_DEPARTURE_AIRPORT_RE = re.compile(r'from\s+([A-Z]{3})')
+_ARRIVAL_AIRPORT_RE = re.compile(r'at\s+([A-Z]{3})')
+
 def get_user_cache_file(user_id):
     """Get the cache file path for a specific user"""
     return CACHE_DIR / f"user_{user_id}.json"
 
+def _entry_signature(entry):
+    """Get a hashable signature for a trip_details entry"""
+    if isinstance(entry, dict):
+        return json.dumps(entry, sort_keys=True)
+    return entry
+
+def _build_index(cache_data):
+    """Attach the dedup sets for the trip_details lists to the cache data"""
+    trip_details = cache_data["trip_details"]
+    cache_data["_index"] = {
+        key: {_entry_signature(entry) for entry in trip_details.setdefault(key, [])}
+        for key in INDEXED_TRIP_LISTS
+    }
+
+def _add_unique(cache_data, key, entry):
+    """Append an entry to a trip_details list unless it is already there"""
+    seen = cache_data["_index"][key]
+    signature = _entry_signature(entry)
+    if signature in seen:
+        return False
+    seen.add(signature)
+    cache_data["trip_details"][key].append(entry)
+    return True
+
+def _intern(value):
+    """Intern recurring strings such as airport codes, cities and airlines"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+def _nested(data, *keys, default="unknown"):
+    """Look up a value in nested dicts, falling back to a default"""
+    for key in keys:
+        data = data.get(key) if isinstance(data, dict) else None
+        if data is None:
+            return default
+    return data
+
+def _seen_recently(user_id, query, tool_calls):
+    """Remember a result and check whether the same one was saved recently"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{user_id}\0{query}".encode())
+    for call in tool_calls:
+        digest.update(f"\0{call['tool']}\0{call['input']}\0{call['output']}".encode())
+    key = digest.hexdigest()
+
+    if key in _recent_results:
+        _recent_results.move_to_end(key)
+        return True
+
+    _recent_results[key] = True
+    if len(_recent_results) > RECENT_RESULTS_MAX:
+        _recent_results.popitem(last=False)
+    return False
+
+def _trim_queries(cache_data):
+    """Drop the oldest queries beyond the history limit"""
+    queries = cache_data.setdefault("queries", [])
+    if len(queries) > QUERY_HISTORY_MAX:
+        del queries[:-QUERY_HISTORY_MAX]
+
+def _file_stamp(cache_file):
+    """Get the modification time and size of a cache file, or None if it is missing"""
+    try:
+        stat = cache_file.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _remember_cache(user_id, cache_data):
+    """Keep a user's cache in process, dropping the least recently used beyond the limit"""
+    _loaded_caches[user_id] = (_file_stamp(get_user_cache_file(user_id)), cache_data)
+    _loaded_caches.move_to_end(user_id)
+    if len(_loaded_caches) > LOADED_CACHES_MAX:
+        _loaded_caches.popitem(last=False)
+
+def _load_cache(user_id):
+    """Get the cache for a user, reading it from disk unless the file is unchanged since last use"""
+    cache_file = get_user_cache_file(user_id)
+    stamp = _file_stamp(cache_file)
+    entry = _loaded_caches.get(user_id)
+    if entry is not None and stamp is not None and entry[0] == stamp:
+        _loaded_caches.move_to_end(user_id)
+        return entry[1]
+    _loaded_caches.pop(user_id, None)
+
+    if stamp is None:
+        return None
+
+    try:
+        with open(cache_file, 'r') as f:
+            cache_data = json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        logger.error(f"Error reading cache file for user {user_id}: {e}")
+        return None
+
+    if not isinstance(cache_data, dict):
+        logger.error(f"Invalid cache data format for user {user_id}")
+        return None
+
+    if "trip_details" in cache_data:
+        _build_index(cache_data)
+    _trim_queries(cache_data)
+    _remember_cache(user_id, cache_data)
+    return cache_data
+
+def _write_cache(cache_file, cache_data):
+    """Write cache data to disk, leaving out in-process keys such as the index"""
+    with open(cache_file, 'w') as f:
+        json.dump({k: v for k, v in cache_data.items() if not k.startswith('_')}, f, indent=2)
+
 def save_to_cache(user_id, query, result):
     """Save information to the user's cache file"""
+    with _cache_lock:
+        _save_to_cache(user_id, query, result)
+
+def _save_to_cache(user_id, query, result):
+    """Save information to the user's cache file (the cache lock must be held)"""
     cache_file = get_user_cache_file(user_id)
     
     # Initialize or load existing cache data
-    if cache_file.exists():
-        with open(cache_file, 'r') as f:
-            cache_data = json.load(f)
-    else:
+    cache_data = _load_cache(user_id)
+    if cache_data is None or "trip_details" not in cache_data:
         cache_data = {
             "user_id": user_id,
             "last_updated": datetime.now().isoformat(),
@@ -41,12 +185,13 @@ def save_to_cache(user_id, query, result):
             },
             "queries": []
         }
+        _build_index(cache_data)
 
     # Extract information from the result
     output_text = result.get("output", "")
     tool_calls = []
     
-    # Extract information from tool calls
+    # Collect the tool calls from the result
     for step in result.get("intermediate_steps", []):
         # Handle both the old format (tuple with LangChain Tool objects) and the new dictionary format
         if isinstance(step, dict):
@@ -72,18 +217,16 @@ def save_to_cache(user_id, query, result):
             "input": tool_input,
             "output": tool_output
         })
-        
-        # Extract and save specific information based on tool type
-        if tool_name == "apify_flight":
-            _extract_flight_info(cache_data, tool_output)
-        elif tool_name == "apify_poi":
-            _extract_poi_info(cache_data, tool_output)
-        elif tool_name == "apify_google_maps":
-            _extract_directions_info(cache_data, tool_input, tool_output)
-        elif tool_name == "perplexity_search":
-            _extract_destination_info(cache_data, query, tool_output)
-        elif tool_name == "vapi_reservation":
-            _extract_reservation_info(cache_data, tool_input, tool_output)
+    
+    # A retried query carries the same tool calls, so its details are already extracted
+    if _seen_recently(user_id, query, tool_calls):
+        logger.info(f"Skipping extraction for repeated query from user {user_id}")
+    else:
+        for call in tool_calls:
+            # Extract and save specific information based on tool type
+            extractor = _TOOL_EXTRACTORS.get(call["tool"])
+            if extractor:
+                extractor(cache_data, call["input"], call["output"], query)
     
     # Add this query to the history
     cache_data["queries"].append({
@@ -92,33 +235,25 @@ def save_to_cache(user_id, query, result):
         "response": output_text,
         "tool_calls": tool_calls
     })
+    _trim_queries(cache_data)
     
     # Update last_updated timestamp
     cache_data["last_updated"] = datetime.now().isoformat()
     
     # Save to file
-    with open(cache_file, 'w') as f:
-        json.dump(cache_data, f, indent=2)
+    _write_cache(cache_file, cache_data)
+    _remember_cache(user_id, cache_data)
     
     logger.info(f"Updated cache for user {user_id}")
 
 def get_from_cache(user_id):
-    """Get the cached information for a user"""
-    cache_file = get_user_cache_file(user_id)
-    
-    if cache_file.exists():
-        try:
-            with open(cache_file, 'r') as f:
-                cache_data = json.load(f)
-                if not isinstance(cache_data, dict):
-                    logger.error(f"Invalid cache data format for user {user_id}")
-                    return None
-                return cache_data
-        except (json.JSONDecodeError, IOError) as e:
-            logger.error(f"Error reading cache file for user {user_id}: {e}")
+    """Get a copy of the cached information for a user"""
+    with _cache_lock:
+        cache_data = _load_cache(user_id)
+        if cache_data is None:
             return None
-    
-    return None
+        # Copied under the lock so callers can read it while other threads save
+        return copy.deepcopy({k: v for k, v in cache_data.items() if not k.startswith('_')})
 
 def _extract_flight_info(cache_data, tool_output):
     """Extract flight information from tool output"""
@@ -132,23 +267,27 @@ def _extract_flight_info(cache_data, tool_output):
         except json.JSONDecodeError:
             # If not JSON, try to extract from HTML formatted message
             flights_data = []
-            lines = tool_output.split('\n')
             current_flight = {}
             
             # Extract date from the first line if it contains a date
-            date_match = re.search(r'(\d{4}-\d{2}-\d{2})', tool_output)
+            date_match = _DATE_RE.search(tool_output)
             current_date = date_match.group(1) if date_match else ""
             
-            for line in lines:
-                line = line.strip()
-                if line.startswith('<b>Flight'):
+            for line in tool_output.splitlines():
+                # Dispatch on the first non-blank character; trailing blanks are
+                # stripped from the key and value below
+                line = line.lstrip()
+                if not line:
+                    continue
+                first = line[0]
+                if first == '<' and line.startswith('<b>Flight'):
                     # New flight entry
                     if current_flight:
                         flights_data.append(current_flight)
                     current_flight = {}
                     if current_date:
                         current_flight['date'] = current_date
-                elif line.startswith('•'):
+                elif first == '•':
                     # Flight detail
                     parts = line[1:].split(':', 1)
                     if len(parts) == 2:
@@ -162,20 +301,20 @@ def _extract_flight_info(cache_data, tool_output):
                             current_flight['flightNumber'] = value
                         elif key == 'departure':
                             # Extract airport code from departure
-                            airport_match = re.search(r'from\s+([A-Z]{3})', value)
+                            airport_match = _DEPARTURE_AIRPORT_RE.search(value)
                             if airport_match:
                                 current_flight['departureAirport'] = airport_match.group(1)
                             # Extract time
-                            time_match = re.search(r'(\d{1,2}:\d{2})', value)
+                            time_match = _TIME_RE.search(value)
                             if time_match:
                                 current_flight['departureTime'] = time_match.group(1)
                         elif key == 'arrival':
                             # Extract airport code from arrival
-                            airport_match = re.search(r'at\s+([A-Z]{3})', value)
+                            airport_match = _ARRIVAL_AIRPORT_RE.search(value)
                             if airport_match:
                                 current_flight['arrivalAirport'] = airport_match.group(1)
                             # Extract time
-                            time_match = re.search(r'(\d{1,2}:\d{2})', value)
+                            time_match = _TIME_RE.search(value)
                             if time_match:
                                 current_flight['arrivalTime'] = time_match.group(1)
                         elif key == 'duration':
@@ -194,28 +333,27 @@ def _extract_flight_info(cache_data, tool_output):
             for flight in flights_data[:3]:  # Take top 3 flights
                 if isinstance(flight, dict):
                     flight_info = {
-                        "from": flight.get("departureAirport", ""),
-                        "to": flight.get("arrivalAirport", ""),
+                        "from": _intern(flight.get("departureAirport", "")),
+                        "to": _intern(flight.get("arrivalAirport", "")),
                         "departure_date": flight.get("date", ""),
                         "arrival_date": flight.get("date", ""),  # Same day for now
-                        "airline": flight.get("airline", ""),
+                        "airline": _intern(flight.get("airline", "")),
                         "price": flight.get("price", ""),
                         "duration": flight.get("duration", "")
                     }
                     
                     # Add to destinations if not already there
-                    origin = flight.get("departureAirport", "")
-                    destination = flight.get("arrivalAirport", "")
+                    origin = flight_info["from"]
+                    destination = flight_info["to"]
                     
-                    if origin and origin not in cache_data["trip_details"]["destinations"]:
-                        cache_data["trip_details"]["destinations"].append(origin)
+                    if origin:
+                        _add_unique(cache_data, "destinations", origin)
                     
-                    if destination and destination not in cache_data["trip_details"]["destinations"]:
-                        cache_data["trip_details"]["destinations"].append(destination)
+                    if destination:
+                        _add_unique(cache_data, "destinations", destination)
                     
                     # Add to flights if not duplicate
-                    if flight_info not in cache_data["trip_details"]["flights"]:
-                        cache_data["trip_details"]["flights"].append(flight_info)
+                    _add_unique(cache_data, "flights", flight_info)
         
     except Exception as e:
         logger.error(f"Error extracting flight info: {e}")
@@ -236,37 +374,47 @@ def _extract_poi_info(cache_data, tool_output):
                     poi_info = {
                         "name": poi.get("name", ""),
                         "type": poi.get("type", "attraction"),
-                        "location": poi.get("location", ""),
+                        "location": _intern(poi.get("location", "")),
                         "rating": poi.get("rating", ""),
                         "description": poi.get("description", "")
                     }
                     
                     # Add to activities if not duplicate
-                    if poi_info not in cache_data["trip_details"]["activities"]:
-                        cache_data["trip_details"]["activities"].append(poi_info)
+                    _add_unique(cache_data, "activities", poi_info)
                     
                     # Add location to destinations if not already there
-                    location = poi.get("location", "")
-                    if location and location not in cache_data["trip_details"]["destinations"]:
-                        cache_data["trip_details"]["destinations"].append(location)
+                    location = poi_info["location"]
+                    if location:
+                        _add_unique(cache_data, "destinations", location)
         
     except Exception as e:
         logger.error(f"Error extracting POI info: {e}")
 
+def _extract_poi_batch_info(cache_data, tool_output):
+    """Extract points of interest from a batch lookup keyed by location"""
+    try:
+        batch = json.loads(tool_output) if isinstance(tool_output, str) else tool_output
+        for pois in batch.values():
+            if isinstance(pois, list):
+                _extract_poi_info(cache_data, pois)
+    except Exception as e:
+        logger.error(f"Error extracting batch POI info: {e}")
+
 def _extract_destination_info(cache_data, query, tool_output):
     """Extract destination information from search query and results"""
     try:
+        query_lower = query.lower()
+        
         # Find destination mentions in the query
         common_destination_keywords = ["in", "to", "visit", "traveling to", "flight to"]
         
         for keyword in common_destination_keywords:
-            if keyword in query.lower():
-                parts = query.lower().split(keyword)
+            if keyword in query_lower:
+                parts = query_lower.split(keyword)
                 if len(parts) > 1:
-                    potential_destination = parts[1].strip().split()[0].capitalize()
+                    potential_destination = _intern(parts[1].strip().split()[0].capitalize())
                     if len(potential_destination) > 3:  # Avoid short words
-                        if potential_destination not in cache_data["trip_details"]["destinations"]:
-                            cache_data["trip_details"]["destinations"].append(potential_destination)
+                        _add_unique(cache_data, "destinations", potential_destination)
         
         # Extract potential dates
         date_keywords = ["on", "from", "between", "during"]
@@ -274,7 +422,6 @@ def _extract_destination_info(cache_data, query, tool_output):
                  "august", "september", "october", "november", "december",
                  "jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
         
-        query_lower = query.lower()
         for month in months:
             if month in query_lower:
                 # If month is mentioned, add as potential travel date
@@ -319,20 +466,21 @@ def _extract_reservation_info(cache_data, tool_input, tool_output):
         if isinstance(tool_output, str):
             confirmation_lines = tool_output.split("\n")
             for line in confirmation_lines:
-                if "confirmation" in line.lower() or "reference" in line.lower():
+                line_lower = line.lower()
+                if "confirmation" in line_lower or "reference" in line_lower:
                     reservation_info["confirmation"] = line.strip()
                     break
             
             # Extract call summary if available
-            if "call summary:" in tool_output.lower():
-                summary_parts = tool_output.lower().split("call summary:")
+            output_lower = tool_output.lower()
+            if "call summary:" in output_lower:
+                summary_parts = output_lower.split("call summary:")
                 if len(summary_parts) > 1:
                     summary_text = summary_parts[1].strip()
                     reservation_info["call_summary"] = summary_text
         
         # Add the reservation if it's not a duplicate
-        if reservation_info not in cache_data["trip_details"]["reservations"]:
-            cache_data["trip_details"]["reservations"].append(reservation_info)
+        _add_unique(cache_data, "reservations", reservation_info)
         
         # If this was a hotel reservation, also add to accommodations
         if service_type.lower() == "hotel":
@@ -345,8 +493,7 @@ def _extract_reservation_info(cache_data, tool_input, tool_output):
                 "confirmation": reservation_info.get("confirmation", "")
             }
             
-            if accommodation_info not in cache_data["trip_details"]["accommodations"]:
-                cache_data["trip_details"]["accommodations"].append(accommodation_info)
+            _add_unique(cache_data, "accommodations", accommodation_info)
         
     except Exception as e:
         logger.error(f"Error extracting reservation info: {e}")
@@ -355,24 +502,21 @@ def _extract_directions_info(cache_data, tool_input, tool_output):
     """Extract directions information from Google Maps tool output"""
     try:
         # Add origin and destination to destinations list if not already there
-        if "from" in tool_input.lower() and "to" in tool_input.lower():
-            parts = tool_input.lower().split("from")
-            if len(parts) > 1:
-                direction_parts = parts[1].split("to")
-                if len(direction_parts) > 1:
-                    origin = direction_parts[0].strip().title()
-                    destination = direction_parts[1].strip().title()
-                    
-                    if origin and origin not in cache_data["trip_details"]["destinations"]:
-                        cache_data["trip_details"]["destinations"].append(origin)
-                    
-                    if destination and destination not in cache_data["trip_details"]["destinations"]:
-                        cache_data["trip_details"]["destinations"].append(destination)
-                    
-                    # Add a note about the directions query
-                    note = f"Requested directions from {origin} to {destination}"
-                    if note not in cache_data["trip_details"]["notes"]:
-                        cache_data["trip_details"]["notes"].append(note)
+        _, found_from, after_from = tool_input.lower().partition("from")
+        origin, found_to, destination = after_from.partition(" to ")
+        if found_from and found_to:
+            origin = _intern(origin.strip().title())
+            destination = _intern(destination.strip().title())
+            
+            if origin:
+                _add_unique(cache_data, "destinations", origin)
+            
+            if destination:
+                _add_unique(cache_data, "destinations", destination)
+            
+            # Add a note about the directions query
+            note = f"Requested directions from {origin} to {destination}"
+            _add_unique(cache_data, "notes", note)
         
         # Try to extract structured data if available
         if isinstance(tool_output, str) and tool_output.strip():
@@ -389,25 +533,39 @@ def _extract_directions_info(cache_data, tool_input, tool_output):
                                     transportation_note = (
                                         f"Travel from {leg.get('startAddress', 'origin')} "
                                         f"to {leg.get('endAddress', 'destination')} - "
-                                        f"Distance: {leg.get('distance', {}).get('text', 'unknown')}, "
-                                        f"Duration: {leg.get('duration', {}).get('text', 'unknown')}"
+                                        f"Distance: {_nested(leg, 'distance', 'text')}, "
+                                        f"Duration: {_nested(leg, 'duration', 'text')}"
                                     )
-                                    if transportation_note not in cache_data["trip_details"]["notes"]:
-                                        cache_data["trip_details"]["notes"].append(transportation_note)
+                                    _add_unique(cache_data, "notes", transportation_note)
             except (json.JSONDecodeError, AttributeError, KeyError, IndexError) as e:
                 logger.debug(f"Could not extract structured directions data: {e}")
     
     except Exception as e:
         logger.error(f"Error extracting directions info: {e}", exc_info=True)
 
+# Extractors for each tool's output, called as (cache_data, tool_input, tool_output, query)
+_TOOL_EXTRACTORS = {
+    "apify_flight": lambda cache_data, tool_input, tool_output, query: _extract_flight_info(cache_data, tool_output),
+    "apify_poi": lambda cache_data, tool_input, tool_output, query: _extract_poi_info(cache_data, tool_output),
+    "apify_poi_batch": lambda cache_data, tool_input, tool_output, query: _extract_poi_batch_info(cache_data, tool_output),
+    "apify_google_maps": lambda cache_data, tool_input, tool_output, query: _extract_directions_info(cache_data, tool_input, tool_output),
+    "perplexity_search": lambda cache_data, tool_input, tool_output, query: _extract_destination_info(cache_data, query, tool_output),
+    "vapi_reservation": lambda cache_data, tool_input, tool_output, query: _extract_reservation_info(cache_data, tool_input, tool_output),
+}
+
 def clear_cache(user_id=None):
     """Clear cache for a user or all users"""
-    if user_id:
-        cache_file = get_user_cache_file(user_id)
-        if cache_file.exists():
-            os.remove(cache_file)
-            logger.info(f"Cleared cache for user {user_id}")
-    else:
-        for cache_file in CACHE_DIR.glob("user_*.json"):
-            os.remove(cache_file)
-        logger.info("Cleared all user caches")
\ No newline at end of file
+    with _cache_lock:
+        # Results remembered for skipping extraction may belong to the cleared caches
+        _recent_results.clear()
+        if user_id:
+            _loaded_caches.pop(user_id, None)
+            cache_file = get_user_cache_file(user_id)
+            if cache_file.exists():
+                os.remove(cache_file)
+                logger.info(f"Cleared cache for user {user_id}")
+        else:
+            _loaded_caches.clear()
+            for cache_file in CACHE_DIR.glob("user_*.json"):
+                os.remove(cache_file)
+            logger.info("Cleared all user caches")
\ No newline at end of file
@@ -4,6 +4,63 @@ from Voyagent.cache_manager import get_from_cache
 # Configure logging
 logger = logging.getLogger(__name__)
 
+def _format_flight(idx, flight):
+    """Format one flight option"""
+    return (
+        f"{idx}. {flight.get('airline', 'Unknown airline')}: {flight.get('from', '')} → {flight.get('to', '')}\n"
+        f"   - Departure: {flight.get('departure_date', 'Unknown date')}\n"
+        f"   - Duration: {flight.get('duration', 'Unknown duration')}\n"
+        f"   - Price: {flight.get('price', 'Unknown price')}\n\n"
+    )
+
+def _format_reservation(idx, reservation):
+    """Format one confirmed reservation"""
+    service_type = reservation.get('service_type', '').capitalize()
+    text = f"{idx}. **{service_type}**: {reservation.get('service_name', 'Unknown')}\n"
+    
+    if reservation.get('date'):
+        text += f"   - Date: {reservation.get('date')}"
+        if reservation.get('time'):
+            text += f" at {reservation.get('time')}"
+        text += "\n"
+        
+    if reservation.get('num_people'):
+        text += f"   - Party size: {reservation.get('num_people')}\n"
+        
+    if reservation.get('confirmation'):
+        text += f"   - {reservation.get('confirmation')}\n"
+        
+    return text + "\n"
+
+def _format_activity(idx, activity):
+    """Format one recommended activity"""
+    text = f"{idx}. {activity.get('name', 'Unknown activity')}"
+    if activity.get('rating'):
+        text += f" ({activity.get('rating')}★)"
+    return text + f"\n   - {activity.get('description', 'No description available')[:100]}...\n\n"
+
+def _format_accommodation(idx, accommodation):
+    """Format one accommodation option"""
+    text = f"{idx}. {accommodation.get('name', 'Unknown accommodation')}\n"
+    for key, label in (("address", "Address: "), ("price", "Price: "), ("check_in", "Check-in: "),
+                       ("duration", "Duration: "), ("confirmation", "")):
+        if accommodation.get(key):
+            text += f"   - {label}{accommodation.get(key)}\n"
+    return text + "\n"
+
+def _format_note(idx, note):
+    """Format one note"""
+    return f"- {note}\n"
+
+# Numbered summary sections: (header, trip_details key, formatter, item limit, footer)
+SECTIONS = (
+    ("## ✈️ Flight Options\n\n", "flights", _format_flight, 3, ""),
+    ("## 🔖 Confirmed Reservations\n\n", "reservations", _format_reservation, None, ""),
+    ("## 🎭 Recommended Activities\n\n", "activities", _format_activity, 5, ""),
+    ("## 🏨 Accommodation Options\n\n", "accommodations", _format_accommodation, 3, ""),
+    ("## 📝 Notes\n\n", "notes", _format_note, None, "\n"),
+)
+
 def generate_summary(user_id):
     """Generate a trip summary from cached information"""
     # Get user data from cache
@@ -19,84 +76,30 @@ def generate_summary(user_id):
         return "I don't have any destination information for your trip yet. Please tell me where you'd like to go."
     
     # Build the summary
-    summary = "# 🌍 Your Trip Summary\n\n"
+    parts = ["# 🌍 Your Trip Summary\n\n"]
     
     # Destinations
     destinations = ", ".join(trip_details["destinations"])
-    summary += f"## 📍 Destinations\n{destinations}\n\n"
+    parts.append(f"## 📍 Destinations\n{destinations}\n\n")
     
     # Travel dates
-    if trip_details["dates"]:
+    if trip_details.get("dates"):
         dates_info = ", ".join([f"{k}: {v}" for k, v in trip_details["dates"].items()])
-        summary += f"## 📅 Travel Dates\n{dates_info}\n\n"
-    
-    # Flights
-    if trip_details["flights"]:
-        summary += "## ✈️ Flight Options\n\n"
-        for idx, flight in enumerate(trip_details["flights"][:3], 1):
-            summary += f"{idx}. {flight.get('airline', 'Unknown airline')}: {flight.get('from', '')} → {flight.get('to', '')}\n"
-            summary += f"   - Departure: {flight.get('departure_date', 'Unknown date')}\n"
-            summary += f"   - Duration: {flight.get('duration', 'Unknown duration')}\n"
-            summary += f"   - Price: {flight.get('price', 'Unknown price')}\n\n"
-    
-    # Reservations (from Rime)
-    if "reservations" in trip_details and trip_details["reservations"]:
-        summary += "## 🔖 Confirmed Reservations\n\n"
-        for idx, reservation in enumerate(trip_details["reservations"], 1):
-            service_type = reservation.get('service_type', '').capitalize()
-            summary += f"{idx}. **{service_type}**: {reservation.get('service_name', 'Unknown')}\n"
-            
-            if reservation.get('date'):
-                summary += f"   - Date: {reservation.get('date')}"
-                if reservation.get('time'):
-                    summary += f" at {reservation.get('time')}"
-                summary += "\n"
-                
-            if reservation.get('num_people'):
-                summary += f"   - Party size: {reservation.get('num_people')}\n"
-                
-            if reservation.get('confirmation'):
-                summary += f"   - {reservation.get('confirmation')}\n"
-                
-            summary += "\n"
+        parts.append(f"## 📅 Travel Dates\n{dates_info}\n\n")
     
-    # Activities
-    if trip_details["activities"]:
-        summary += "## 🎭 Recommended Activities\n\n"
-        for idx, activity in enumerate(trip_details["activities"][:5], 1):
-            summary += f"{idx}. {activity.get('name', 'Unknown activity')}"
-            if activity.get('rating'):
-                summary += f" ({activity.get('rating')}★)"
-            summary += f"\n   - {activity.get('description', 'No description available')[:100]}...\n\n"
-    
-    # Accommodations
-    if trip_details["accommodations"]:
-        summary += "## 🏨 Accommodation Options\n\n"
-        for idx, accommodation in enumerate(trip_details["accommodations"][:3], 1):
-            summary += f"{idx}. {accommodation.get('name', 'Unknown accommodation')}\n"
-            if accommodation.get('address'):
-                summary += f"   - Address: {accommodation.get('address')}\n"
-            if accommodation.get('price'):
-                summary += f"   - Price: {accommodation.get('price')}\n"
-            if accommodation.get('check_in'):
-                summary += f"   - Check-in: {accommodation.get('check_in')}\n"
-            if accommodation.get('duration'):
-                summary += f"   - Duration: {accommodation.get('duration')}\n"
-            if accommodation.get('confirmation'):
-                summary += f"   - {accommodation.get('confirmation')}\n"
-            summary += "\n"
-    
-    # Notes
-    if trip_details["notes"]:
-        summary += "## 📝 Notes\n\n"
-        for note in trip_details["notes"]:
-            summary += f"- {note}\n"
-        summary += "\n"
+    # Flights, reservations, activities, accommodations and notes
+    for header, key, formatter, limit, footer in SECTIONS:
+        items = trip_details.get(key)
+        if not items:
+            continue
+        parts.append(header)
+        for idx, item in enumerate(items[:limit] if limit else items, 1):
+            parts.append(formatter(idx, item))
+        parts.append(footer)
     
     # Call to action
-    summary += "---\n"
-    summary += "Need more details? Ask me about specific attractions, restaurants, or travel tips for your destination!\n"
-    summary += "Want to make a reservation? Just ask and I can call to book restaurants, hotels or attractions on your behalf!"
+    parts.append("---\n")
+    parts.append("Need more details? Ask me about specific attractions, restaurants, or travel tips for your destination!\n")
+    parts.append("Want to make a reservation? Just ask and I can call to book restaurants, hotels or attractions on your behalf!")
     
-    return summary
-
+    return "".join(parts)
@@ -1,12 +1,29 @@
-from Voyagent.tools.perplexity import PerplexitySearchTool
-from Voyagent.tools.apify import ApifyFlightTool, ApifyPOITool, ApifyGoogleMapsTool
-from Voyagent.tools.deepl import DeepLTranslateTool
-from Voyagent.tools.vapi import VapiReservationTool
+import importlib
+
+# Tool classes are imported on first access so that importing one tool module
+# does not load the others and their dependencies
+_LAZY_IMPORTS = {
+    'PerplexitySearchTool': 'Voyagent.tools.perplexity',
+    'ApifyFlightTool': 'Voyagent.tools.apify',
+    'ApifyPOITool': 'Voyagent.tools.apify',
+    'ApifyPOIBatchTool': 'Voyagent.tools.apify',
+    'ApifyGoogleMapsTool': 'Voyagent.tools.apify',
+    'DeepLTranslateTool': 'Voyagent.tools.deepl',
+    'VapiReservationTool': 'Voyagent.tools.vapi',
+}
+
+def __getattr__(name):
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name]), name)
+    globals()[name] = value
+    return value
 
 __all__ = [
     'PerplexitySearchTool',
     'ApifyFlightTool',
     'ApifyPOITool',
+    'ApifyPOIBatchTool',
     'ApifyGoogleMapsTool',
     'DeepLTranslateTool',
     'VapiReservationTool'
@@ -1,22 +1,446 @@
 import os
+import sys
 import json
+import asyncio
 import logging
+import math
+import random
 import requests
+import threading
 import time
 import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, List, Tuple
-from dotenv import load_dotenv
+from typing import Any, Optional, Tuple
 from langchain.tools import BaseTool
+from pydantic import PrivateAttr
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-# Load environment variables
-load_dotenv()
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _dumps(obj):
+    """Serialize tool output to a JSON string, using orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode()
+        except TypeError:
+            pass
+    return json.dumps(obj)
+
+def _loads(data):
+    """Parse a JSON str or bytes, using orjson when it is installed"""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+# Environment variables are loaded once by the entrypoint (app.py / agent_runner)
+# before this module is imported; call refresh_token() if they change later
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 APIFY_BASE_URL = "https://api.apify.com/v2"
 
+# Fields of formatted flight queries like "from: SFO, to: Fresno, date: 2025-05-03".
+# The lookahead lets a field be found inside another field's value, as separate
+# searches would.
+_FLIGHT_QUERY_RE = re.compile(r'(?=(from|to|date):\s*([^,]+))')
+
+# Natural language flight query patterns, compiled once for every parse
+_FROM_TO_RE = re.compile(r'from\s+([a-z\s0-9-]+)\s+to\s+([a-z\s0-9-]+)')
+_TO_FROM_RE = re.compile(r'to\s+([a-z\s0-9-]+)\s+from\s+([a-z\s0-9-]+)')
+_DATE_PATTERNS = [re.compile(pattern) for pattern in (
+    r'(?:on|for|date[:\s])\s*(\d{4}-\d{1,2}-\d{1,2})',  # YYYY-MM-DD
+    r'(?:on|for|date[:\s])\s*(\d{1,2}/\d{1,2}/\d{4})',  # MM/DD/YYYY
+    r'(?:on|for|date[:\s])\s*(\d{1,2}/\d{1,2}/\d{2})',  # MM/DD/YY
+    r'(?:on|for|date[:\s])\s*([a-z]+\s+\d{1,2}(?:st|nd|rd|th)?(?:,?\s*\d{4})?)'  # Month DD, YYYY
+)]
+# Dates already in YYYY-MM-DD form; no other format can parse them, so they are
+# returned as they are
+_ISO_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+_NEXT_PERIOD_RE = re.compile(r'next\s+(week|month)')
+_IN_PERIOD_RE = re.compile(r'in\s+(\d+)\s+(day|week|month)s?')
+_THIS_WEEKEND_RE = re.compile(r'this\s+(weekend)')
+# Verbs of "travel/visit/going to Y" queries, in priority order (the last one found wins)
+_TRAVEL_VERBS = ("travel", "visit", "going", "fly", "traveling", "visiting")
+_TRAVEL_VERB_RE = re.compile("(?=(" + "|".join(_TRAVEL_VERBS) + ") to)")
+# Full and abbreviated month names for "2nd week of May" style dates
+_MONTH_TO_NUM = {
+    'january': 1, 'february': 2, 'march': 3, 'april': 4,
+    'may': 5, 'june': 6, 'july': 7, 'august': 8,
+    'september': 9, 'october': 10, 'november': 11, 'december': 12,
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+}
+_WEEK_OF_MONTH_RE = re.compile(r'(\d+)(?:st|nd|rd|th)?\s+week\s+of\s+([a-z]+)')
+_DESTINATION_PATTERNS = [re.compile(r'to\s+([a-z\s]+)(?:\s|\.|\?|$)'),
+                         re.compile(r'visit(?:ing)?\s+([a-z\s]+)(?:\s|\.|\?|$)')]
+
+# Start runs and poll them instead of waiting on run-sync-get-dataset-items.
+# Only needed for actors that run longer than the sync endpoint allows.
+POLL_APIFY_RUNS = os.getenv("APIFY_POLL_RUNS", "").lower() in ("1", "true", "yes")
+
+# Apify run statuses after which polling stops
+TERMINAL = frozenset({"SUCCEEDED", "FAILED", "TIMED-OUT", "ABORTED"})
+
+# The pause between status checks starts short and backs off up to a cap
+POLL_INITIAL_DELAY = 0.3
+POLL_BACKOFF = 1.25
+POLL_MAX_DELAY = 3.0
+# (connect, read) timeout for each status check so a stalled poll can't hang the
+# run; the read timeout is on top of the server-side wait below
+POLL_REQUEST_TIMEOUT = (3, 10)
+# Longest Apify will hold a status request open waiting for the run to finish
+POLL_WAIT_FOR_FINISH = 60
+
+# Caps concurrent actor runs across request threads and async callers
+MAX_CONCURRENT_RUNS = 8
+_RUN_SLOTS = threading.BoundedSemaphore(MAX_CONCURRENT_RUNS)
+
+# Shared HTTP session so Apify calls reuse pooled keep-alive connections
+_SESSION = requests.Session()
+# Adapter retries cover connection failures; 5xx responses are retried with
+# jitter by _request_with_backoff, so they are not also retried here
+_SESSION.mount("https://", HTTPAdapter(pool_connections=20, pool_maxsize=20,
+                                       max_retries=Retry(total=3, backoff_factor=0.5)))
+
+# Token and auth headers are read once; call refresh_token() after rotating the token
+_API_TOKEN = None
+_HEADERS = None
+
+def refresh_token():
+    """Re-read APIFY_API_TOKEN and update the shared session's auth headers"""
+    global _API_TOKEN, _HEADERS
+    _API_TOKEN = os.getenv("APIFY_API_TOKEN")
+    _HEADERS = {
+        "Authorization": f"Bearer {_API_TOKEN}",
+        "Content-Type": "application/json"
+    } if _API_TOKEN else None
+    _SESSION.headers.pop("Authorization", None)
+    if _HEADERS:
+        _SESSION.headers.update(_HEADERS)
+    else:
+        # Logged here once rather than on every tool call
+        logger.error("Apify API token not found; Apify tools will return errors")
+    return _API_TOKEN
+
+refresh_token()
+
+class _TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed number of seconds"""
+    
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Get a cached value, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key, value):
+        """Cache a value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+# Most locations looked up by one apify_poi_batch call
+POI_BATCH_MAX = 5
+# Bulky Tripadvisor fields left out of POI results; the agent summarizes places
+# from their names, types, ratings and descriptions, not photo or review lists
+POI_OMIT_FIELDS = "photos,reviews,reviewTags,nearestMetroStations"
+
+# Apify results by normalized location, by (from, to, date) and by normalized
+# maps query. Flight schedules and prices change faster than places.
+_POI_CACHE = _TTLCache(maxsize=512, ttl=1800)
+_FLIGHT_CACHE = _TTLCache(maxsize=512, ttl=600)
+_MAPS_CACHE = _TTLCache(maxsize=512, ttl=1800)
+# Gemini-generated fallback flights by (FROM, TO, date), kept separate so a
+# recovered scraper is not masked by sample data
+_DUMMY_FLIGHT_CACHE = _TTLCache(maxsize=256, ttl=3600)
+
+def _request_with_backoff(method, url, max_attempts=5, **kwargs):
+    """Send a request on the shared session, retrying 5xx responses and network errors."""
+    for attempt in range(max_attempts):
+        try:
+            response = _SESSION.request(method, url, **kwargs)
+            if response.status_code < 500 or attempt == max_attempts - 1:
+                return response
+            logger.warning("Apify %s %s returned %s, retrying", method, url, response.status_code)
+        except requests.exceptions.RequestException as e:
+            if attempt == max_attempts - 1:
+                raise
+            logger.warning("Apify %s %s failed: %s, retrying", method, url, e)
+        # Wait 1s, 2s, 4s, ... up to 60s, with jitter so clients don't retry in lockstep
+        time.sleep(min(60, 1.0 * 2 ** attempt) * random.uniform(0.8, 1.2))
+
+# Static route data, read from mock_data.json the first time it is needed
+MOCK_DATA_FILE = Path(__file__).parent / "mock_data.json"
+
+@lru_cache(maxsize=None)
+def _mock_data():
+    """Load the static flight and directions data."""
+    return _loads(MOCK_DATA_FILE.read_bytes())
+
+@lru_cache(maxsize=64)
+def _sfo_to_fat_flights_json(date):
+    """Serialize the first two static SFO to Fresno flights for a given date."""
+    flights = _mock_data()["flights"]["SFO|FAT"][:2]
+    return _dumps([dict(flight, date=date) for flight in flights])
+
+@lru_cache(maxsize=None)
+def _sfo_to_fat_flights_html():
+    """Format the static SFO to Fresno flights as the HTML flight list."""
+    message = ""
+    for i, flight in enumerate(_mock_data()["flights"]["SFO|FAT"], 1):
+        message += f"<b>Flight {i}:</b>\n"
+        message += f"• Airline: {flight['airline']}\n"
+        message += f"• Flight: {flight['flightNumber']}\n"
+        message += f"• Departure: {flight['departureTime']} from {flight['departureAirport']}\n"
+        message += f"• Arrival: {flight['arrivalTime']} at {flight['arrivalAirport']}\n"
+        message += f"• Duration: {flight['duration']}\n"
+        message += f"• Price: {flight['price']}\n"
+        message += f"• Stops: {flight['stops']}\n\n"
+    return message
+
+# City names and codes that map to the airports of the static flight routes
+_AIRPORT_ALIASES = {
+    "sf": "SFO",
+    "san francisco": "SFO",
+    "sfo": "SFO",
+    "fresno": "FAT",
+    "fres": "FAT",
+}
+_STATIC_FLIGHT_ROUTES = frozenset({("SFO", "FAT")})
+# Upper-cased origin/destination pairs whose dummy data is the static SFO to Fresno list
+_DUMMY_SFO_FAT_ROUTES = frozenset({("SFO", "FAT"), ("SAN FRANCISCO", "FRESNO"), ("SF", "FRESNO")})
+
+# (latitude, longitude) of common airports, used to estimate fallback flights
+# without asking Gemini
+_AIRPORT_COORDS = {
+    "ATL": (33.64, -84.43), "BOS": (42.36, -71.01), "DEN": (39.86, -104.67),
+    "DFW": (32.90, -97.04), "FAT": (36.78, -119.72), "IAH": (29.98, -95.34),
+    "JFK": (40.64, -73.78), "LAS": (36.08, -115.15), "LAX": (33.94, -118.41),
+    "MCO": (28.43, -81.31), "MIA": (25.80, -80.29), "ORD": (41.98, -87.90),
+    "PDX": (45.59, -122.60), "PHX": (33.43, -112.01), "SAN": (32.73, -117.19),
+    "SEA": (47.45, -122.31), "SFO": (37.62, -122.38), "SLC": (40.79, -111.98),
+    "IAD": (38.95, -77.46), "HNL": (21.32, -157.92), "YYZ": (43.68, -79.63),
+    "LHR": (51.47, -0.45), "CDG": (49.01, 2.55), "FRA": (50.03, 8.56),
+    "BER": (52.37, 13.50), "FCO": (41.80, 12.25), "MAD": (40.47, -3.57),
+    "AMS": (52.31, 4.76), "NRT": (35.77, 140.39), "HND": (35.55, 139.78),
+}
+# Casefolded city names for the airports above. Cities the flight search
+# already normalizes come from _AIRPORT_ALIASES, so they are listed only there.
+_CITY_AIRPORTS = {
+    **_AIRPORT_ALIASES,
+    "atlanta": "ATL", "boston": "BOS", "denver": "DEN", "dallas": "DFW",
+    "houston": "IAH", "new york": "JFK", "nyc": "JFK",
+    "las vegas": "LAS", "los angeles": "LAX", "la": "LAX", "orlando": "MCO",
+    "miami": "MIA", "chicago": "ORD", "portland": "PDX", "phoenix": "PHX",
+    "san diego": "SAN", "seattle": "SEA",
+    "salt lake city": "SLC", "washington": "IAD", "honolulu": "HNL",
+    "toronto": "YYZ", "london": "LHR", "paris": "CDG", "frankfurt": "FRA",
+    "berlin": "BER", "rome": "FCO", "madrid": "MAD", "amsterdam": "AMS",
+    "tokyo": "HND",
+}
+
+def _airport_code(place):
+    """Return the airport code for an airport code or city name in _AIRPORT_COORDS, or None."""
+    key = place.casefold().strip()
+    code = _CITY_AIRPORTS.get(key, key.upper())
+    return code if code in _AIRPORT_COORDS else None
+
+def _great_circle_km(origin_code, destination_code):
+    """Get the great-circle distance in kilometres between two airports in _AIRPORT_COORDS."""
+    lat1, lon1 = map(math.radians, _AIRPORT_COORDS[origin_code])
+    lat2, lon2 = map(math.radians, _AIRPORT_COORDS[destination_code])
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371 * math.asin(math.sqrt(a))
+
+def _estimated_flights(origin_code, destination_code, date):
+    """Estimate two flight options between known airports from their great-circle distance."""
+    distance_km = _great_circle_km(origin_code, destination_code)
+    # About 30 minutes of taxi, climb and descent plus cruise at 800 km/h
+    minutes = int(30 + distance_km / 800 * 60)
+    price = int(60 + distance_km * 0.1)
+    return [
+        {
+            "airline": "Major Airline",
+            "flightNumber": f"Flight {number}",
+            "departureAirport": origin_code,
+            "arrivalAirport": destination_code,
+            "departureTime": departure,
+            "arrivalTime": "Varies by schedule",
+            "duration": f"{minutes // 60}h {minutes % 60}m",
+            "price": f"${price}-{price * 2}",
+            "stops": 0,
+            "date": date or "Next available",
+            "note": "This is estimated information. Please check airline websites for current schedules."
+        }
+        for number, departure in ((101, "Morning"), (205, "Evening"))
+    ]
+
+# Keywords that identify the endpoints of the static directions routes, in
+# priority order
+_PLACE_KEYWORDS = (
+    ("san francisco", "san francisco"),
+    ("sf", "san francisco"),
+    ("yosemite", "yosemite"),
+    ("fresno", "fresno"),
+)
+
+# All place keywords matched in one scan; the lookahead also finds keywords
+# that overlap each other
+_PLACE_KEYWORD_RE = re.compile("(?=(" + "|".join(re.escape(keyword) for keyword, _ in _PLACE_KEYWORDS) + "))")
+_PLACE_PRIORITY = {keyword: (rank, place) for rank, (keyword, place) in enumerate(_PLACE_KEYWORDS)}
+
+# Term lists for routing general travel and directions queries, each matched
+# in a single regex scan instead of one substring test per term
+_TRAVEL_TERM_RE = re.compile("travel|visit|trip|vacation|tour|journey|exploring")
+_TRAVEL_QUESTION_RE = re.compile("what should i do|what are my options|how can i get|how to get")
+_TRAVEL_DESTINATION_RE = re.compile("to (?:yosemite|national park|beach|mountain)")
+_DIRECTIONS_TERM_RE = re.compile("directions|driving time|how to get|drive from|driving from")
+# Origin/destination patterns of directions queries, tried in order. The
+# "X to Y directions" pattern can only start where a sentence does, since a
+# match found later in a sentence would extend back to its start anyway;
+# anchoring it there stops the search retrying from every character, which
+# took seconds on long messages.
+_DIRECTIONS_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'directions\s+from\s+([^\.]+)\s+to\s+([^\.]+)',
+    r'how\s+to\s+get\s+from\s+([^\.]+)\s+to\s+([^\.]+)',
+    r'route\s+from\s+([^\.]+)\s+to\s+([^\.]+)',
+    r'(?:^|(?<=\.))([^\.]+)\s+to\s+([^\.]+)\s+directions',
+    r'driving\s+from\s+([^\.]+)\s+to\s+([^\.]+)',
+    r'drive\s+from\s+([^\.]+)\s+to\s+([^\.]+)'
+))
+
+# Earlier destinations win when a query mentions several
+_COMMON_DESTINATIONS = ("yosemite", "grand canyon", "new york", "las vegas", "paris", "tokyo")
+_COMMON_DESTINATION_RE = re.compile("(?=(" + "|".join(_COMMON_DESTINATIONS) + "))")
+
+def _match_place(text):
+    """Get the static-route place mentioned in a directions endpoint, if any."""
+    hits = {match.group(1) for match in _PLACE_KEYWORD_RE.finditer(text.casefold())}
+    if not hits:
+        return None
+    return min(_PLACE_PRIORITY[keyword] for keyword in hits)[1]
+
+@lru_cache(maxsize=None)
+def _static_directions_json(route):
+    """Serialize the static directions for a "origin|destination" route."""
+    return _dumps(_mock_data()["directions"][route])
+
+def _wait_for_run(run_id, api_token, max_wait_time):
+    """Poll an Apify run until it finishes or max_wait_time passes, and return its last status."""
+    status_url = f"{APIFY_BASE_URL}/actor-runs/{run_id}"
+    start_time = time.time()
+    delay = POLL_INITIAL_DELAY
+    run_status = None
+    while time.time() - start_time < max_wait_time:
+        # Apify answers as soon as the run finishes, so most runs need a single check
+        wait = int(min(max_wait_time - (time.time() - start_time), POLL_WAIT_FOR_FINISH))
+        try:
+            status_resp = _request_with_backoff("GET", status_url, max_attempts=1,
+                                                params={"token": api_token, "waitForFinish": wait},
+                                                timeout=(POLL_REQUEST_TIMEOUT[0], POLL_REQUEST_TIMEOUT[1] + wait))
+            status_resp.raise_for_status()
+            run_status = _loads(status_resp.content)["data"]["status"]
+            logger.info("Polling Apify run %s: status=%s", run_id, run_status)
+            if run_status in TERMINAL:
+                break
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            # A failed status check waits on the same schedule instead of ending the search
+            logger.warning("Could not get status of Apify run %s: %s", run_id, e)
+        # Jitter keeps runs started at the same time from polling in lockstep
+        time.sleep(delay * random.uniform(0.8, 1.2))
+        delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+    return run_status
+
+class ApifyRunError(Exception):
+    """Raised when an Apify actor run finishes without succeeding."""
+    
+    def __init__(self, run_id, status):
+        super().__init__(f"Apify run {run_id} finished with status {status}")
+        self.status = status
+
+def _run_actor(actor_id, payload, api_token, max_wait_time, omit=None):
+    """Run an Apify actor and return its dataset items, without the omit fields.
+    
+    Raises requests.exceptions.Timeout if a polled run does not finish in time
+    and ApifyRunError if it finishes without succeeding.
+    """
+    with _RUN_SLOTS:
+        if not POLL_APIFY_RUNS:
+            # One blocking request runs the actor and returns its dataset items
+            return _run_actor_sync(actor_id, payload, api_token, max_wait_time, omit)
+    
+        # Start the actor run; waitForFinish has Apify answer once it finishes,
+        # so short runs come back finished and skip polling
+        url = f"{APIFY_BASE_URL}/acts/{actor_id}/runs"
+        start_time = time.time()
+        wait = int(min(max_wait_time, POLL_WAIT_FOR_FINISH))
+        # A retry would start a second run, so only one attempt is made
+        response = _request_with_backoff("POST", url, max_attempts=1, json=payload,
+                                         params={"token": api_token, "waitForFinish": wait},
+                                         timeout=(POLL_REQUEST_TIMEOUT[0], POLL_REQUEST_TIMEOUT[1] + wait))
+        response.raise_for_status()
+        run_info = _loads(response.content)
+        run_id = run_info["data"]["id"]
+        dataset_id = run_info["data"]["defaultDatasetId"]
+        run_status = run_info["data"].get("status")
+        logger.info("Apify actor run started: run_id=%s, dataset_id=%s, status=%s", run_id, dataset_id, run_status)
+    
+        # Poll for run completion with the time that is left
+        if run_status not in TERMINAL:
+            run_status = _wait_for_run(run_id, api_token, max_wait_time - (time.time() - start_time))
+        if run_status not in TERMINAL:
+            raise requests.exceptions.Timeout(f"Apify run {run_id} did not finish within {max_wait_time} seconds")
+        if run_status != "SUCCEEDED":
+            raise ApifyRunError(run_id, run_status)
+    
+        dataset_url = f"{APIFY_BASE_URL}/datasets/{dataset_id}/items"
+        return _fetch_dataset_items("GET", dataset_url, api_token, omit=omit)
+
+def _run_actor_sync(actor_id, payload, api_token, max_wait_time, omit=None):
+    """Run an Apify actor and get its dataset items in a single request."""
+    # The run's own timeout matches ours so Apify stops it when we stop waiting
+    url = f"{APIFY_BASE_URL}/acts/{actor_id}/run-sync-get-dataset-items?timeout={int(max_wait_time)}"
+    # A retry would start a second run, so only one attempt is made
+    return _fetch_dataset_items("POST", url, api_token, omit=omit, max_attempts=1, json=payload, timeout=max_wait_time)
+
+def _fetch_dataset_items(method, url, api_token, limit=10, omit=None, **kwargs):
+    """Stream dataset items as JSON lines, parsing each one as it arrives."""
+    # clean drops empty items and hidden fields; omit drops fields nobody reads
+    params = {"token": api_token, "format": "jsonl", "limit": limit, "clean": "true"}
+    if omit:
+        params["omit"] = omit
+    with _request_with_backoff(method, url, stream=True, params=params, **kwargs) as response:
+        response.raise_for_status()
+        items = []
+        for line in response.iter_lines():
+            if line:
+                items.append(_loads(line))
+                if len(items) >= limit:
+                    break
+        return items
+
 class ApifyFlightTool(BaseTool):
     name = "apify_flight"
     description = """
@@ -31,11 +455,10 @@ class ApifyFlightTool(BaseTool):
     
     def _run(self, query: str) -> str:
         """Run flight search with fallbacks to ensure reliable results."""
-        logger.info(f"TOOL: apify_flight - Query: {query}")
+        logger.info("TOOL: apify_flight - Query: %s", query)
         
-        api_token = os.getenv("APIFY_API_TOKEN")
+        api_token = _API_TOKEN
         if not api_token:
-            logger.error("Apify API token not found")
             return "Error: Apify API token not configured"
         
         # Parse query to extract parameters
@@ -54,42 +477,48 @@ class ApifyFlightTool(BaseTool):
                 return "I couldn't determine the departure and destination cities from your query. Could you please specify where you're traveling from and to?"
         
         # Fix common city names to airport codes
-        if params["from"].lower() in ["sf", "san francisco", "sfo"]:
-            params["from"] = "SFO"
-        if params["to"].lower() in ["fresno", "fres"]:
-            params["to"] = "FAT"
+        params["from"] = _AIRPORT_ALIASES.get(params["from"].casefold().strip(), params["from"])
+        params["to"] = _AIRPORT_ALIASES.get(params["to"].casefold().strip(), params["to"])
             
         # Check for common routes first and use static data
-        if (params["from"].upper() == "SFO" and params["to"].upper() == "FAT") or \
-           (params["from"].lower() in ["san francisco", "sf"] and params["to"].lower() in ["fresno"]):
+        if (params["from"].upper(), params["to"].upper()) in _STATIC_FLIGHT_ROUTES:
             logger.info("Using static data for SFO to Fresno route")
             return self._generate_sfo_to_fresno_flights(params.get("date", ""))
 
+        # Reuse a recent result for the same route and date; the parts are
+        # interned since the same cities and dates recur across turns
+        cache_key = (sys.intern(params["from"].strip().lower()),
+                     sys.intern(params["to"].strip().lower()),
+                     sys.intern(params.get("date", "").strip()))
+        cached = _FLIGHT_CACHE.get(cache_key)
+        if cached is not None:
+            logger.info("Using cached flight results for %s", cache_key)
+            return cached
+
         # Try to use a more general web scraper actor with a flight search URL
         try:
             logger.info("Using general web scraper for flight search")
             result = self._run_general_web_scraper(params["from"], params["to"], params.get("date", ""))
             if result and not result.startswith("Error:"):
+                _FLIGHT_CACHE.set(cache_key, result)
                 return result
         except Exception as e:
-            logger.error(f"General web scraper failed: {str(e)}")
+            logger.error("General web scraper failed: %s", e)
             
         # If general scraper failed, use Gemini to generate flight data
         logger.warning("Flight search failed. Generating data with Gemini.")
         return self._generate_dummy_flight_data(params["from"], params["to"], params.get("date", ""))
     
+    async def _arun(self, query: str) -> str:
+        """Run the flight search in a worker thread so async callers can gather several lookups."""
+        return await asyncio.get_running_loop().run_in_executor(None, self._run, query)
+
     def _run_general_web_scraper(self, origin, destination, date):
         """Use a general purpose web scraper to get flight data."""
-        api_token = os.getenv("APIFY_API_TOKEN")
+        api_token = _API_TOKEN
         
         # Use the stable web-scraper actor which is regularly maintained
         actor_id = "apify/web-scraper"
-        url = f"{APIFY_BASE_URL}/acts/{actor_id}/runs"
-        
-        headers = {
-            "Authorization": f"Bearer {api_token}",
-            "Content-Type": "application/json"
-        }
         
         # Format date for the URL if provided
         formatted_date = date
@@ -168,50 +597,24 @@ class ApifyFlightTool(BaseTool):
         }
         
         try:
-            logger.info(f"Running Apify actor {actor_id} for flight search")
-            # Start the actor run
-            response = requests.post(url, headers=headers, json=payload, params={"token": api_token})
-            response.raise_for_status()
-            run_info = response.json()
-            run_id = run_info["data"]["id"]
-            dataset_id = run_info["data"]["defaultDatasetId"]
-            logger.info(f"Apify actor run started: run_id={run_id}, dataset_id={dataset_id}")
+            logger.info("Running Apify actor %s for flight search", actor_id)
+            scrape_results = _run_actor(actor_id, payload, api_token, max_wait_time=60)
             
-            # Poll for run completion with timeout
-            status_url = f"{APIFY_BASE_URL}/actor-runs/{run_id}"
-            max_wait_time = 60  # 1-minute timeout
-            start_time = time.time()
-            while time.time() - start_time < max_wait_time:
-                status_resp = requests.get(status_url, params={"token": api_token})
-                status_data = status_resp.json()
-                run_status = status_data["data"]["status"]
-                logger.info(f"Polling Apify run {run_id}: status={run_status}")
-                if run_status in ["SUCCEEDED", "FAILED", "TIMED-OUT", "ABORTED"]:
-                    break
-                time.sleep(5)
-            
-            # Check result
-            if run_status == "SUCCEEDED":
-                dataset_url = f"{APIFY_BASE_URL}/datasets/{dataset_id}/items"
-                dataset_resp = requests.get(dataset_url, params={"token": api_token, "format": "json", "limit": 10})
-                dataset_resp.raise_for_status()
-                scrape_results = dataset_resp.json()
+            if scrape_results and len(scrape_results) > 0:
+                # Process the scraped data
+                processed_data = []
+                for item in scrape_results:
+                    if "flights" in item and len(item["flights"]) > 0:
+                        processed_data.extend(item["flights"])
+                
+                if processed_data:
+                    return _dumps(processed_data)
                 
-                if scrape_results and len(scrape_results) > 0:
-                    # Process the scraped data
-                    processed_data = []
-                    for item in scrape_results:
-                        if "flights" in item and len(item["flights"]) > 0:
-                            processed_data.extend(item["flights"])
-                    
-                    if processed_data:
-                        return json.dumps(processed_data)
-                    
             # If we got here, the scraper didn't find useful data
             return f"Error: Could not retrieve flight data from web scraper"
             
         except Exception as e:
-            logger.error(f"Error with web scraper: {str(e)}")
+            logger.error("Error with web scraper: %s", e)
             return f"Error: Web scraper failed: {str(e)}"
             
     def _generate_sfo_to_fresno_flights(self, date):
@@ -219,59 +622,8 @@ class ApifyFlightTool(BaseTool):
         # Use the date if provided, otherwise use a default
         flight_date = date if date else "2025-05-12"  # Default to a week from current date if no date specified
         
-        flights = [
-            {
-                "airline": "United Airlines",
-                "flightNumber": "UA5201",
-                "departureAirport": "SFO",
-                "arrivalAirport": "FAT",
-                "departureTime": "08:30",
-                "arrivalTime": "09:35",
-                "duration": "1h 5m",
-                "price": "$129",
-                "stops": 0,
-                "date": flight_date
-            },
-            {
-                "airline": "United Airlines",
-                "flightNumber": "UA5209", 
-                "departureAirport": "SFO",
-                "arrivalAirport": "FAT",
-                "departureTime": "16:45",
-                "arrivalTime": "17:50",
-                "duration": "1h 5m",
-                "price": "$149",
-                "stops": 0,
-                "date": flight_date
-            },
-            {
-                "airline": "United Airlines",
-                "flightNumber": "UA5107",
-                "departureAirport": "SFO", 
-                "arrivalAirport": "FAT",
-                "departureTime": "11:15",
-                "arrivalTime": "12:20",
-                "duration": "1h 5m",
-                "price": "$139",
-                "stops": 0, 
-                "date": flight_date
-            }
-        ]
-        
-        # Format the flights into a human-readable message using HTML
-        message = f"<b>✈️ Flights from SFO to Fresno on {flight_date}</b>\n\n"
-        
-        for i, flight in enumerate(flights, 1):
-            message += f"<b>Flight {i}:</b>\n"
-            message += f"• Airline: {flight['airline']}\n"
-            message += f"• Flight: {flight['flightNumber']}\n"
-            message += f"• Departure: {flight['departureTime']} from {flight['departureAirport']}\n"
-            message += f"• Arrival: {flight['arrivalTime']} at {flight['arrivalAirport']}\n"
-            message += f"• Duration: {flight['duration']}\n"
-            message += f"• Price: {flight['price']}\n"
-            message += f"• Stops: {flight['stops']}\n\n"
-            
-        return message
+        # The flight list doesn't depend on the date, only the heading does
+        return f"<b>✈️ Flights from SFO to Fresno on {flight_date}</b>\n\n" + _sfo_to_fat_flights_html()
     
     def _parse_flight_query(self, query: str) -> dict:
         """Parse the flight query to extract parameters with improved NLP understanding."""
@@ -280,31 +632,26 @@ class ApifyFlightTool(BaseTool):
         
         # Special case for formatted queries like "from: SFO, to: Fresno, date: 2025-05-03"
         if "from:" in query_lower and "to:" in query_lower:
-            from_match = re.search(r'from:\s*([^,]+)', query_lower)
-            to_match = re.search(r'to:\s*([^,]+)', query_lower)
-            date_match = re.search(r'date:\s*([^,]+)', query_lower)
-            
-            if from_match:
-                params["from"] = from_match.group(1).strip()
-            if to_match:
-                params["to"] = to_match.group(1).strip()
-            if date_match:
-                params["date"] = date_match.group(1).strip()
+            # The first occurrence of each field wins
+            found = {}
+            for match in _FLIGHT_QUERY_RE.finditer(query_lower):
+                found.setdefault(match.group(1), match.group(2).strip())
+            params.update(found)
                 
-            logger.info(f"Parsed formatted query: from={params['from']}, to={params['to']}, date={params['date']}")
+            logger.info("Parsed formatted query: from=%s, to=%s, date=%s", params['from'], params['to'], params['date'])
             return params
         
         # Extract cities using common travel patterns
         # Pattern 1: "from X to Y"
-        from_to_match = re.search(r'from\s+([a-z\s0-9-]+)\s+to\s+([a-z\s0-9-]+)', query_lower)
+        from_to_match = _FROM_TO_RE.search(query_lower)
         if from_to_match:
             params["from"] = from_to_match.group(1).strip()
-            params["to"] = from_to_match.group(2).strip().split(" on ")[0].split(" in ")[0].split(" next ")[0].strip()
+            params["to"] = from_to_match.group(2).strip().partition(" on ")[0].partition(" in ")[0].partition(" next ")[0].strip()
         
         # Pattern 2: "X to Y" or "traveling to Y from X"
         elif "to" in query_lower:
             # Try "traveling to Y from X" pattern
-            to_from_match = re.search(r'to\s+([a-z\s0-9-]+)\s+from\s+([a-z\s0-9-]+)', query_lower)
+            to_from_match = _TO_FROM_RE.search(query_lower)
             if to_from_match:
                 params["to"] = to_from_match.group(1).strip()
                 params["from"] = to_from_match.group(2).strip()
@@ -320,27 +667,20 @@ class ApifyFlightTool(BaseTool):
                     params["to"] = " ".join(dest_part).strip()
         
         # Pattern 3: "travel/visit/going to Y"
-        travel_verbs = ["travel", "visit", "going", "fly", "traveling", "visiting"]
-        for verb in travel_verbs:
-            if f"{verb} to" in query_lower:
-                dest_part = query_lower.split(f"{verb} to")[1].strip().split()[0:3]
-                params["to"] = " ".join(dest_part).strip().split(".")[0].strip()
-                # For these patterns, try to find origin if mentioned
-                if "from" in query_lower:
-                    from_part = query_lower.split("from")[1].strip().split()[0:3]
-                    params["from"] = " ".join(from_part).strip()
+        verbs = {match.group(1) for match in _TRAVEL_VERB_RE.finditer(query_lower)}
+        if verbs:
+            verb = max(verbs, key=_TRAVEL_VERBS.index)
+            dest_part = query_lower.split(f"{verb} to")[1].strip().split()[0:3]
+            params["to"] = " ".join(dest_part).strip().partition(".")[0].strip()
+            # For these patterns, try to find origin if mentioned
+            if "from" in query_lower:
+                from_part = query_lower.split("from")[1].strip().split()[0:3]
+                params["from"] = " ".join(from_part).strip()
         
         # Extract dates
         # Check for specific date formats
-        date_patterns = [
-            r'(?:on|for|date[:\s])\s*(\d{4}-\d{1,2}-\d{1,2})',  # YYYY-MM-DD
-            r'(?:on|for|date[:\s])\s*(\d{1,2}/\d{1,2}/\d{4})',  # MM/DD/YYYY
-            r'(?:on|for|date[:\s])\s*(\d{1,2}/\d{1,2}/\d{2})',  # MM/DD/YY
-            r'(?:on|for|date[:\s])\s*([a-z]+\s+\d{1,2}(?:st|nd|rd|th)?(?:,?\s*\d{4})?)'  # Month DD, YYYY
-        ]
-        
-        for pattern in date_patterns:
-            date_match = re.search(pattern, query_lower)
+        for pattern in _DATE_PATTERNS:
+            date_match = pattern.search(query_lower)
             if date_match:
                 date_str = date_match.group(1).strip()
                 params["date"] = self._normalize_date(date_str)
@@ -348,13 +688,13 @@ class ApifyFlightTool(BaseTool):
         
         # Check for relative dates
         relative_date_patterns = [
-            (r'next\s+(week|month)', lambda m: self._calculate_relative_date(m.group(1))),
-            (r'in\s+(\d+)\s+(day|week|month)s?', lambda m: self._calculate_relative_date(m.group(2), int(m.group(1)))),
-            (r'this\s+(weekend)', lambda m: self._calculate_this_weekend())
+            (_NEXT_PERIOD_RE, lambda m: self._calculate_relative_date(m.group(1))),
+            (_IN_PERIOD_RE, lambda m: self._calculate_relative_date(m.group(2), int(m.group(1)))),
+            (_THIS_WEEKEND_RE, lambda m: self._calculate_this_weekend())
         ]
         
         for pattern, date_func in relative_date_patterns:
-            rel_date_match = re.search(pattern, query_lower)
+            rel_date_match = pattern.search(query_lower)
             if rel_date_match:
                 params["date"] = date_func(rel_date_match)
                 break
@@ -370,17 +710,19 @@ class ApifyFlightTool(BaseTool):
                 params["from"] = "San Francisco"
             
             # Try to extract date from queries like "2nd week of May"
-            week_match = re.search(r'(\d+)(?:st|nd|rd|th)?\s+week\s+of\s+([a-z]+)', query_lower)
+            week_match = _WEEK_OF_MONTH_RE.search(query_lower)
             if week_match:
                 week_num = int(week_match.group(1))
                 month = week_match.group(2)
                 params["date"] = self._calculate_week_of_month(week_num, month)
                 
-        logger.info(f"Parsed natural language query: from={params['from']}, to={params['to']}, date={params['date']}")
+        logger.info("Parsed natural language query: from=%s, to=%s, date=%s", params['from'], params['to'], params['date'])
         return params
         
     def _normalize_date(self, date_str: str) -> str:
         """Convert various date formats to YYYY-MM-DD."""
+        if _ISO_DATE_RE.fullmatch(date_str):
+            return date_str
         try:
             # Try various formats
             for fmt in ["%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%B %d, %Y", "%B %d %Y", "%b %d, %Y", "%b %d %Y"]:
@@ -407,12 +749,13 @@ class ApifyFlightTool(BaseTool):
     def _calculate_relative_date(self, unit: str, amount: int = 1) -> str:
         """Calculate relative dates like 'next week' or 'in 3 days'."""
         today = datetime.now()
+        unit = unit.lower()
         
-        if unit.lower() == 'day':
+        if unit == 'day':
             future = today + timedelta(days=amount)
-        elif unit.lower() == 'week':
+        elif unit == 'week':
             future = today + timedelta(weeks=amount)
-        elif unit.lower() == 'month':
+        elif unit == 'month':
             # Approximate a month as 30 days
             future = today + timedelta(days=30*amount)
         else:
@@ -427,13 +770,7 @@ class ApifyFlightTool(BaseTool):
             year = now.year
             
             # Convert month name to number
-            month_num = {
-                'january': 1, 'february': 2, 'march': 3, 'april': 4,
-                'may': 5, 'june': 6, 'july': 7, 'august': 8,
-                'september': 9, 'october': 10, 'november': 11, 'december': 12,
-                'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
-                'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
-            }.get(month_name.lower())
+            month_num = _MONTH_TO_NUM.get(month_name.lower())
             
             if not month_num:
                 return ""
@@ -467,15 +804,13 @@ class ApifyFlightTool(BaseTool):
     def _is_general_travel_query(self, query: str) -> bool:
         """Determine if this is a general travel query that might not be specifically about flights."""
         query_lower = query.lower()
-        travel_terms = ["travel", "visit", "trip", "vacation", "tour", "journey", "exploring"]
-        question_terms = ["what should i do", "what are my options", "how can i get", "how to get"]
         
         # Check if it contains travel terms and question patterns
-        has_travel_terms = any(term in query_lower for term in travel_terms)
-        has_question = any(term in query_lower for term in question_terms)
+        has_travel_terms = _TRAVEL_TERM_RE.search(query_lower) is not None
+        has_question = _TRAVEL_QUESTION_RE.search(query_lower) is not None
         
         # Check for destination without specific flight request
-        destination_mentioned = any(f"to {place}" in query_lower for place in ["yosemite", "national park", "beach", "mountain"])
+        destination_mentioned = _TRAVEL_DESTINATION_RE.search(query_lower) is not None
         
         return (has_travel_terms or has_question) and destination_mentioned
     
@@ -484,15 +819,13 @@ class ApifyFlightTool(BaseTool):
         query_lower = query.lower()
         
         # Check for specific destinations
-        common_destinations = ["yosemite", "grand canyon", "new york", "las vegas", "paris", "tokyo"]
-        for dest in common_destinations:
-            if dest in query_lower:
-                return dest.title()
+        hits = {match.group(1) for match in _COMMON_DESTINATION_RE.finditer(query_lower)}
+        if hits:
+            return min(hits, key=_COMMON_DESTINATIONS.index).title()
         
         # Try to extract destination using "to" patterns
-        to_patterns = [r'to\s+([a-z\s]+)(?:\s|\.|\?|$)', r'visit(?:ing)?\s+([a-z\s]+)(?:\s|\.|\?|$)']
-        for pattern in to_patterns:
-            match = re.search(pattern, query_lower)
+        for pattern in _DESTINATION_PATTERNS:
+            match = pattern.search(query_lower)
             if match:
                 destination = match.group(1).strip()
                 # Remove trailing words that aren't part of the destination
@@ -506,7 +839,7 @@ class ApifyFlightTool(BaseTool):
     
     def _handle_destination_query(self, location: str, original_query: str) -> str:
         """Handle a query about a destination rather than a specific flight search."""
-        logger.info(f"Redirecting flight query to location-based search for: {location}")
+        logger.info("Redirecting flight query to location-based search for: %s", location)
         
         # Create a message suggesting using a different tool
         msg = {
@@ -517,51 +850,38 @@ class ApifyFlightTool(BaseTool):
             "message": f"I found that you're interested in traveling to {location}. To get information about attractions, activities, and transportation options at this destination, I recommend using a location-based search instead."
         }
         
-        return json.dumps(msg)
+        return _dumps(msg)
         
     def _generate_dummy_flight_data(self, origin, destination, date):
         """Generate dummy flight data when all API calls fail."""
-        logger.info(f"Generating dummy flight data for {origin} to {destination}")
+        logger.info("Generating dummy flight data for %s to %s", origin, destination)
         
         # Common flight routes with realistic data
-        if (origin.upper() == "SFO" and destination.upper() == "FAT") or \
-           (origin.lower() in ["san francisco", "sf"] and destination.lower() in ["fresno"]):
+        if (origin.upper(), destination.upper()) in _DUMMY_SFO_FAT_ROUTES:
             # SFO to Fresno route
-            return json.dumps([
-                {
-                    "airline": "United Airlines",
-                    "flightNumber": "UA5201",
-                    "departureAirport": "SFO",
-                    "arrivalAirport": "FAT",
-                    "departureTime": "08:30",
-                    "arrivalTime": "09:35",
-                    "duration": "1h 5m",
-                    "price": "$129",
-                    "stops": 0,
-                    "date": date or "2025-05-09"
-                },
-                {
-                    "airline": "United Airlines",
-                    "flightNumber": "UA5209",
-                    "departureAirport": "SFO",
-                    "arrivalAirport": "FAT",
-                    "departureTime": "16:45",
-                    "arrivalTime": "17:50",
-                    "duration": "1h 5m",
-                    "price": "$149",
-                    "stops": 0,
-                    "date": date or "2025-05-09"
-                }
-            ])
+            return _sfo_to_fat_flights_json(date or "2025-05-09")
+        
+        # Estimate routes between known airports locally instead of asking Gemini
+        origin_code = _airport_code(origin)
+        destination_code = _airport_code(destination)
+        if origin_code and destination_code and origin_code != destination_code:
+            return _dumps(_estimated_flights(origin_code, destination_code, date))
+        
+        # Reuse sample flights Gemini already generated for this route and date
+        cache_key = (sys.intern(origin.upper()), sys.intern(destination.upper()), date)
+        cached = _DUMMY_FLIGHT_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
         
         # For other routes, generate reasonable estimates
         try:
             # Try to get information from Google Gemini
-            from langchain_google_genai import ChatGoogleGenerativeAI
-            from langchain_core.messages import SystemMessage, HumanMessage
-            
             api_key = os.getenv("GOOGLE_API_KEY")
             if api_key:
+                # Imported only when Gemini is actually called
+                from langchain_google_genai import ChatGoogleGenerativeAI
+                from langchain_core.messages import SystemMessage, HumanMessage
+                
                 llm = ChatGoogleGenerativeAI(
                     model="gemini-1.5-flash",
                     temperature=0,
@@ -598,13 +918,14 @@ class ApifyFlightTool(BaseTool):
                     if json_start >= 0 and json_end > 0:
                         json_str = response[json_start:json_end]
                         # Validate JSON
-                        json.loads(json_str)
+                        _loads(json_str)
+                        _DUMMY_FLIGHT_CACHE.set(cache_key, json_str)
                         return json_str
                 except Exception as e:
-                    logger.error(f"Error generating flight data with Gemini: {e}")
+                    logger.error("Error generating flight data with Gemini: %s", e)
             
             # If Gemini fails or API key not available, use fallback
-            return json.dumps([
+            return _dumps([
                 {
                     "airline": "Major Airline",
                     "flightNumber": "Flight 101",
@@ -621,9 +942,9 @@ class ApifyFlightTool(BaseTool):
             ])
             
         except Exception as e:
-            logger.error(f"Error in dummy data generation: {e}")
+            logger.error("Error in dummy data generation: %s", e)
             # Final fallback
-            return json.dumps([{
+            return _dumps([{
                 "message": f"No flight data available for {origin} to {destination}. Please check airline websites directly.",
                 "possible_airlines": ["United", "American", "Delta", "Southwest"],
                 "estimated_price_range": "$120-350"
@@ -640,26 +961,26 @@ class ApifyPOITool(BaseTool):
     
     def _run(self, location: str) -> str:
         """Run Apify Tripadvisor Scraper with the given location."""
-        logger.info(f"TOOL: apify_poi - Location: {location}")
+        logger.info("TOOL: apify_poi - Location: %s", location)
         
         # Check if the input looks like a query rather than a location
         if len(location.split()) > 4 or "?" in location:
-            logger.warning(f"Input looks like a query rather than a location: {location}")
+            logger.warning("Input looks like a query rather than a location: %s", location)
             return f"Error: Cannot process this as a location. Please provide a specific destination name."
         
-        api_token = os.getenv("APIFY_API_TOKEN")
+        api_token = _API_TOKEN
         if not api_token:
-            logger.error("Apify API token not found")
             return "Error: Apify API token not configured"
         
+        # Reuse a recent result for the same location
+        cache_key = sys.intern(location.strip().lower())
+        cached = _POI_CACHE.get(cache_key)
+        if cached is not None:
+            logger.info("Using cached POI results for %s", cache_key)
+            return cached
+        
         # Use the correct Tripadvisor scraper actor ID
         actor_id = "maxcopell~tripadvisor"  # Updated to the correct actor ID
-        url = f"{APIFY_BASE_URL}/acts/{actor_id}/runs"
-        
-        headers = {
-            "Authorization": f"Bearer {api_token}",
-            "Content-Type": "application/json"
-        }
         
         # Prepare payload based on actor's expected input schema
         payload = {
@@ -670,58 +991,83 @@ class ApifyPOITool(BaseTool):
             "maxItems": 10
         }
         
+        max_wait_time = 60  # Reduced timeout to 60 seconds (1 minute)
         try:
-            logger.info(f"Running Apify actor {actor_id} with payload: {json.dumps(payload)}")
-            # Start the actor run
-            response = requests.post(url, headers=headers, json=payload, params={"token": api_token})
-            response.raise_for_status()
-            run_info = response.json()
-            run_id = run_info["data"]["id"]
-            dataset_id = run_info["data"]["defaultDatasetId"]
-            logger.info(f"Apify actor run started: run_id={run_id}, dataset_id={dataset_id}")
-
-            # Poll for run completion with timeout
-            status_url = f"{APIFY_BASE_URL}/actor-runs/{run_id}"
-            max_wait_time = 60  # Reduced timeout to 60 seconds (1 minute)
-            start_time = time.time()
-            while time.time() - start_time < max_wait_time:
-                status_resp = requests.get(status_url, params={"token": api_token})
-                status_data = status_resp.json()
-                run_status = status_data["data"]["status"]
-                logger.info(f"Polling Apify run {run_id}: status={run_status}")
-                if run_status in ["SUCCEEDED", "FAILED", "TIMED-OUT", "ABORTED"]:
-                    break
-                time.sleep(5)
-            
-            # Check if we timed out
-            elapsed_time = time.time() - start_time
-            if elapsed_time >= max_wait_time:
-                logger.warning(f"Apify actor run timed out after {elapsed_time:.1f} seconds")
-                return f"Error: POI search timed out after {elapsed_time:.1f} seconds. Consider using a more specific location name or trying a different search."
-                
-            if run_status != "SUCCEEDED":
-                logger.error(f"Apify actor run {run_id} did not succeed. Status: {run_status}")
-                return f"Error: POI search failed with status {run_status}"
-
-            # Get dataset items
-            dataset_url = f"{APIFY_BASE_URL}/datasets/{dataset_id}/items"
-            dataset_resp = requests.get(dataset_url, params={"token": api_token, "format": "json", "limit": 10})
-            dataset_resp.raise_for_status()
-            pois = dataset_resp.json()
+            # Only serialize the payload when INFO logging is on
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Running Apify actor %s with payload: %s", actor_id, _dumps(payload))
+            pois = _run_actor(actor_id, payload, api_token, max_wait_time, omit=POI_OMIT_FIELDS)
             
             if not pois:
                  return "No points of interest found for this location."
                  
-            logger.info(f"Received {len(pois)} POI results from Apify.")
-            return json.dumps(pois)
+            logger.info("Received %s POI results from Apify.", len(pois))
+            result = _dumps(pois)
+            _POI_CACHE.set(cache_key, result)
+            return result
 
+        except requests.exceptions.Timeout:
+            logger.warning("Apify actor run timed out after %s seconds", max_wait_time)
+            return f"Error: POI search timed out after {max_wait_time} seconds. Consider using a more specific location name or trying a different search."
+        except ApifyRunError as e:
+            logger.error("%s", e)
+            return f"Error: POI search failed with status {e.status}"
         except requests.exceptions.RequestException as e:
-            logger.error(f"Error calling Apify API: {e}")
+            logger.error("Error calling Apify API: %s", e)
             return f"Error searching for points of interest: {str(e)}"
         except Exception as e:
-            logger.error(f"An unexpected error occurred during POI search: {e}", exc_info=True)
+            logger.error("An unexpected error occurred during POI search: %s", e, exc_info=True)
             return f"An unexpected error occurred while searching for points of interest."
 
+    async def _arun(self, location: str) -> str:
+        """Run the POI search in a worker thread so async callers can gather several lookups."""
+        return await asyncio.get_running_loop().run_in_executor(None, self._run, location)
+
+class ApifyPOIBatchTool(BaseTool):
+    name = "apify_poi_batch"
+    description = """
+    Finds points of interest, attractions, restaurants and activities in several
+    destinations at once, e.g. when planning a multi-city itinerary.
+    
+    Input should be location names separated by semicolons, e.g. "Paris, France; Rome; Tokyo"
+    """
+    
+    _poi_tool: Any = PrivateAttr(default=None)
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._poi_tool = ApifyPOITool()
+    
+    def _run(self, locations: str) -> str:
+        """Look up points of interest for each location concurrently."""
+        logger.info("TOOL: apify_poi_batch - Locations: %s", locations)
+        
+        names = []
+        seen = set()
+        for name in re.split(r'[;\n]', locations):
+            name = name.strip()
+            key = name.lower()
+            if name and key not in seen:
+                seen.add(key)
+                names.append(name)
+        if not names:
+            return "Error: Please provide at least one location name."
+        names = names[:POI_BATCH_MAX]
+        
+        # The Tripadvisor actor takes one location per run, so the runs are
+        # started together on the shared session; cached locations skip the run
+        with ThreadPoolExecutor(max_workers=len(names)) as executor:
+            results = list(executor.map(self._poi_tool._run, names))
+        
+        batch = {}
+        for name, result in zip(names, results):
+            batch[name] = _loads(result) if result.startswith("[") else result
+        return _dumps(batch)
+    
+    async def _arun(self, locations: str) -> str:
+        """Run the batch POI search in a worker thread."""
+        return await asyncio.get_running_loop().run_in_executor(None, self._run, locations)
+
 class ApifyGoogleMapsTool(BaseTool):
     name = "apify_google_maps"
     description = """
@@ -737,31 +1083,33 @@ class ApifyGoogleMapsTool(BaseTool):
     
     def _run(self, query: str) -> str:
         """Run Apify Google Maps Scraper with the given query."""
-        logger.info(f"TOOL: apify_google_maps - Query: {query}")
+        logger.info("TOOL: apify_google_maps - Query: %s", query)
         
-        api_token = os.getenv("APIFY_API_TOKEN")
+        api_token = _API_TOKEN
         if not api_token:
-            logger.error("Apify API token not found")
             return "Error: Apify API token not configured"
             
+        # Reuse a recent result for the same query
+        query_lower = query.lower()
+        cache_key = sys.intern(" ".join(query_lower.split()))
+        cached = _MAPS_CACHE.get(cache_key)
+        if cached is not None:
+            logger.info("Using cached maps results for %s", cache_key)
+            return cached
+            
         # Determine if it's a directions query
-        is_directions_query = any(term in query.lower() for term in 
-                              ["directions", "driving time", "how to get", "drive from", "driving from"])
+        is_directions_query = _DIRECTIONS_TERM_RE.search(query_lower) is not None
         
         # Extract origin and destination if available
         origin_dest = None
         if is_directions_query:
             origin_dest = self._extract_directions_endpoints(query)
             
-        # Fast path for SF to Yosemite directions - use static data
-        if origin_dest and (("san francisco" in origin_dest[0].lower() or "sf" in origin_dest[0].lower()) and 
-                         "yosemite" in origin_dest[1].lower()):
-            return self._get_sf_to_yosemite_directions()
-            
-        # Fast path for SF to Fresno directions - use static data
-        if origin_dest and (("san francisco" in origin_dest[0].lower() or "sf" in origin_dest[0].lower()) and 
-                         "fresno" in origin_dest[1].lower()):
-            return self._get_sf_to_fresno_directions()
+        # Fast path for routes with static directions (SF to Yosemite, SF to Fresno)
+        if origin_dest:
+            route = f"{_match_place(origin_dest[0])}|{_match_place(origin_dest[1])}"
+            if route in _mock_data()["directions"]:
+                return _static_directions_json(route)
             
         # Choose appropriate actor configurations based on query type
         actor_configs = []
@@ -801,19 +1149,20 @@ class ApifyGoogleMapsTool(BaseTool):
                 actor_id = config["actor_id"]
                 payload_creator = config["payload_creator"]
                 
-                logger.info(f"Trying Apify actor: {actor_id}")
+                logger.info("Trying Apify actor: %s", actor_id)
                 result = self._run_apify_actor(actor_id, query, payload_creator)
                 
                 # If we got a successful result, return it
                 if result and not result.startswith("Error:"):
+                    _MAPS_CACHE.set(cache_key, result)
                     return result
                 
                 # Otherwise, store the error and try the next actor
                 last_error = result
-                logger.warning(f"Actor {actor_id} failed: {last_error}")
+                logger.warning("Actor %s failed: %s", actor_id, last_error)
                 
             except Exception as e:
-                logger.error(f"Error with actor {config['actor_id']}: {str(e)}")
+                logger.error("Error with actor %s: %s", config['actor_id'], e)
                 last_error = str(e)
         
         # If all actors failed, generate dummy directions data
@@ -823,69 +1172,41 @@ class ApifyGoogleMapsTool(BaseTool):
         else:
             return self._generate_dummy_place_data(query)
             
+    async def _arun(self, query: str) -> str:
+        """Run the maps search in a worker thread so async callers can gather several lookups."""
+        return await asyncio.get_running_loop().run_in_executor(None, self._run, query)
+    
     def _run_apify_actor(self, actor_id, query, payload_creator):
         """Run a specific Apify actor with the given parameters."""
-        api_token = os.getenv("APIFY_API_TOKEN")
-        url = f"{APIFY_BASE_URL}/acts/{actor_id}/runs"
-        
-        headers = {
-            "Authorization": f"Bearer {api_token}",
-            "Content-Type": "application/json"
-        }
+        api_token = _API_TOKEN
         
         # Create the payload based on the specific actor requirements
         payload = payload_creator(query)
         
+        max_wait_time = 120  # 2-minute timeout
         try:
-            logger.info(f"Running Apify actor {actor_id} with payload: {json.dumps(payload)}")
-            # Start the actor run
-            response = requests.post(url, headers=headers, json=payload, params={"token": api_token})
-            response.raise_for_status()
-            run_info = response.json()
-            run_id = run_info["data"]["id"]
-            dataset_id = run_info["data"]["defaultDatasetId"]
-            logger.info(f"Apify actor run started: run_id={run_id}, dataset_id={dataset_id}")
-            
-            # Poll for run completion with timeout
-            status_url = f"{APIFY_BASE_URL}/actor-runs/{run_id}"
-            max_wait_time = 120  # 2-minute timeout
-            start_time = time.time()
-            while time.time() - start_time < max_wait_time:
-                status_resp = requests.get(status_url, params={"token": api_token})
-                status_data = status_resp.json()
-                run_status = status_data["data"]["status"]
-                logger.info(f"Polling Apify run {run_id}: status={run_status}")
-                if run_status in ["SUCCEEDED", "FAILED", "TIMED-OUT", "ABORTED"]:
-                    break
-                time.sleep(5)
-            
-            # Handle timeout
-            if time.time() - start_time >= max_wait_time:
-                logger.warning(f"Apify actor {actor_id} timed out after {max_wait_time} seconds")
-                return f"Error: Maps search timed out after {max_wait_time} seconds"
-                
-            # Check if the run succeeded
-            if run_status != "SUCCEEDED":
-                logger.error(f"Apify actor run {run_id} did not succeed. Status: {run_status}")
-                return f"Error: Maps search failed with status {run_status}"
-
-            # Get dataset items
-            dataset_url = f"{APIFY_BASE_URL}/datasets/{dataset_id}/items"
-            dataset_resp = requests.get(dataset_url, params={"token": api_token, "format": "json", "limit": 10})
-            dataset_resp.raise_for_status()
-            maps_data = dataset_resp.json()
+            # Only serialize the payload when INFO logging is on
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Running Apify actor %s with payload: %s", actor_id, _dumps(payload))
+            maps_data = _run_actor(actor_id, payload, api_token, max_wait_time)
             
             if not maps_data:
                 return f"Error: No results found for this query"
                  
-            logger.info(f"Received {len(maps_data)} results from Apify actor {actor_id}.")
-            return json.dumps(maps_data)
+            logger.info("Received %s results from Apify actor %s.", len(maps_data), actor_id)
+            return _dumps(maps_data)
             
+        except requests.exceptions.Timeout:
+            logger.warning("Apify actor %s timed out after %s seconds", actor_id, max_wait_time)
+            return f"Error: Maps search timed out after {max_wait_time} seconds"
+        except ApifyRunError as e:
+            logger.error("%s", e)
+            return f"Error: Maps search failed with status {e.status}"
         except requests.exceptions.RequestException as e:
-            logger.error(f"Error calling Apify API: {e}")
+            logger.error("Error calling Apify API: %s", e)
             return f"Error: API request failed: {str(e)}"
         except Exception as e:
-            logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+            logger.error("An unexpected error occurred: %s", e, exc_info=True)
             return f"Error: {str(e)}"
     
     def _create_honeybe_directions_payload(self, query, origin_dest):
@@ -952,109 +1273,18 @@ class ApifyGoogleMapsTool(BaseTool):
             
         return payload
         
-    def _get_sf_to_yosemite_directions(self):
-        """Return static directions data for San Francisco to Yosemite."""
-        return json.dumps({
-            "directions": {
-                "origin": "San Francisco, CA",
-                "destination": "Yosemite National Park, CA",
-                "routes": [
-                    {
-                        "name": "Primary Route via I-580 E and CA-120 E",
-                        "distance": {"text": "169 mi", "value": 272000},
-                        "duration": {"text": "3 hours 40 mins", "value": 13200},
-                        "summary": "Take I-580 E and CA-120 E to Big Oak Flat Rd in Tuolumne County",
-                        "warnings": ["Route includes mountain roads that may close seasonally due to snow."],
-                        "steps": [
-                            "Take I-80 E toward Oakland",
-                            "Use right lane to take I-580 E toward Hayward/Stockton",
-                            "Continue on I-580 E to Tracy",
-                            "Take exit 65 for I-205 E toward Manteca/Tracy",
-                            "Continue onto I-5 N",
-                            "Take exit 461 for CA-120 E toward Sonora/Yosemite",
-                            "Continue on CA-120 E to Yosemite National Park"
-                        ]
-                    },
-                    {
-                        "name": "Alternate Route via CA-99 S",
-                        "distance": {"text": "192 mi", "value": 308000},
-                        "duration": {"text": "4 hours", "value": 14400},
-                        "summary": "Take US-101 S to CA-99 S, then CA-140 E into Yosemite Valley",
-                        "warnings": ["This route enters through the western side of Yosemite Valley"],
-                        "steps": [
-                            "Take US-101 S toward San Jose",
-                            "Take CA-99 S toward Fresno",
-                            "In Merced, take CA-140 E toward Yosemite",
-                            "Follow CA-140 E into Yosemite National Park"
-                        ]
-                    }
-                ],
-                "travel_tips": [
-                    "The drive is approximately 3.5-4.5 hours depending on traffic and route",
-                    "Check road conditions before traveling in winter months as chains may be required",
-                    "Tioga Pass (CA-120 through the park) is typically closed November through May",
-                    "All park entrances require a reservation or pass",
-                    "Gas stations are limited in the mountains, fill up before leaving major towns",
-                    "Cell service is limited in and around the park"
-                ]
-            }
-        })
-        
-    def _get_sf_to_fresno_directions(self):
-        """Return static directions data for San Francisco to Fresno."""
-        return json.dumps({
-            "directions": {
-                "origin": "San Francisco, CA",
-                "destination": "Fresno, CA",
-                "routes": [
-                    {
-                        "name": "Primary Route via I-5 S and CA-152 E",
-                        "distance": {"text": "188 mi", "value": 302000},
-                        "duration": {"text": "2 hours 50 mins", "value": 10200},
-                        "summary": "Fastest route via I-5 S",
-                        "steps": [
-                            "Take US-101 S toward San Jose",
-                            "Take I-5 S toward Los Angeles",
-                            "Take exit 403 for CA-152 E toward Los Banos/Fresno",
-                            "Continue on CA-152 E",
-                            "Use right lane to take CA-99 S toward Fresno",
-                            "Continue on CA-99 S to Fresno"
-                        ]
-                    },
-                    {
-                        "name": "Alternate Route via CA-99 S",
-                        "distance": {"text": "194 mi", "value": 312000},
-                        "duration": {"text": "3 hours 10 mins", "value": 11400},
-                        "summary": "Take I-580 E to CA-99 S",
-                        "steps": [
-                            "Take I-80 E toward Oakland",
-                            "Take I-580 E toward Stockton",
-                            "Continue to CA-99 S in Manteca",
-                            "Follow CA-99 S to Fresno"
-                        ]
-                    }
-                ],
-                "travel_tips": [
-                    "The I-5 route is typically faster but has fewer services",
-                    "The CA-99 route has more towns and service stops along the way",
-                    "Traffic can be heavy leaving the Bay Area during rush hours",
-                    "Central Valley temperatures can be extreme in summer - check your car's cooling system",
-                    "Winter fog can reduce visibility in the Central Valley"
-                ]
-            }
-        })
-        
     def _generate_dummy_directions_data(self, origin, destination):
         """Generate dummy directions data when all API calls fail."""
-        logger.info(f"Generating dummy directions data for {origin} to {destination}")
+        logger.info("Generating dummy directions data for %s to %s", origin, destination)
         
         try:
             # Try to get information from Google Gemini
-            from langchain_google_genai import ChatGoogleGenerativeAI
-            from langchain_core.messages import SystemMessage, HumanMessage
-            
             api_key = os.getenv("GOOGLE_API_KEY")
             if api_key:
+                # Imported only when Gemini is actually called
+                from langchain_google_genai import ChatGoogleGenerativeAI
+                from langchain_core.messages import SystemMessage, HumanMessage
+                
                 llm = ChatGoogleGenerativeAI(
                     model="gemini-1.5-flash",
                     temperature=0,
@@ -1090,15 +1320,15 @@ class ApifyGoogleMapsTool(BaseTool):
                     if json_start >= 0 and json_end > 0:
                         json_str = response[json_start:json_end]
                         # Validate JSON
-                        directions_data = json.loads(json_str)
-                        return json.dumps({"directions": directions_data})
+                        directions_data = _loads(json_str)
+                        return _dumps({"directions": directions_data})
                 except Exception as e:
-                    logger.error(f"Error generating directions with Gemini: {e}")
+                    logger.error("Error generating directions with Gemini: %s", e)
         except Exception as e:
-            logger.error(f"Error in dummy directions data generation: {e}")
+            logger.error("Error in dummy directions data generation: %s", e)
             
         # If Gemini fails, use a generic template
-        return json.dumps({
+        return _dumps({
             "directions": {
                 "origin": origin,
                 "destination": destination,
@@ -1121,7 +1351,7 @@ class ApifyGoogleMapsTool(BaseTool):
     
     def _generate_dummy_place_data(self, query):
         """Generate dummy place data when all API calls fail."""
-        return json.dumps([{
+        return _dumps([{
             "message": f"No results found for '{query}'. Please try a different search.",
             "note": "The maps service is currently unavailable. Try again later or check directly on Google Maps."
         }])
@@ -1131,17 +1361,8 @@ class ApifyGoogleMapsTool(BaseTool):
         query_lower = query.lower()
         
         # Try various patterns for directions
-        patterns = [
-            r'directions\s+from\s+([^\.]+)\s+to\s+([^\.]+)', 
-            r'how\s+to\s+get\s+from\s+([^\.]+)\s+to\s+([^\.]+)',
-            r'route\s+from\s+([^\.]+)\s+to\s+([^\.]+)',
-            r'([^\.]+)\s+to\s+([^\.]+)\s+directions',
-            r'driving\s+from\s+([^\.]+)\s+to\s+([^\.]+)',
-            r'drive\s+from\s+([^\.]+)\s+to\s+([^\.]+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, query_lower)
+        for pattern in _DIRECTIONS_PATTERNS:
+            match = pattern.search(query_lower)
             if match:
                 origin = match.group(1).strip()
                 destination = match.group(2).strip()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Checks for the fallback flight estimates in apify.py.
+
+Run with pytest, or directly: python -m Voyagent.tools.apify_estimate_test
+"""
+from Voyagent.tools.apify import (
+    _AIRPORT_ALIASES,
+    _airport_code,
+    _estimated_flights,
+    _great_circle_km,
+)
+
+
+def test_known_route_distance():
+    # SFO to Fresno is about 254 km, SFO to JFK about 4,150 km
+    assert 240 < _great_circle_km("SFO", "FAT") < 270
+    assert 4100 < _great_circle_km("SFO", "JFK") < 4200
+    assert _great_circle_km("SFO", "FAT") == _great_circle_km("FAT", "SFO")
+
+
+def test_known_route_flights():
+    flights = _estimated_flights("SFO", "FAT", "2025-05-09")
+    assert len(flights) == 2
+    for flight in flights:
+        assert flight["departureAirport"] == "SFO"
+        assert flight["arrivalAirport"] == "FAT"
+        assert flight["date"] == "2025-05-09"
+        hours, minutes = flight["duration"].rstrip("m").split("h ")
+        # A short hop: under an hour including taxi, climb and descent
+        assert 40 <= int(hours) * 60 + int(minutes) <= 60
+
+
+def test_city_names_match_flight_aliases():
+    # The estimate must resolve the same airport the flight search normalizes to
+    for city, code in _AIRPORT_ALIASES.items():
+        assert _airport_code(city) == code
+        assert _airport_code(city.upper()) == code
+    assert _airport_code("New York") == "JFK"
+    assert _airport_code("Boise") is None
+
+
+if __name__ == "__main__":
+    test_known_route_distance()
+    test_known_route_flights()
+    test_city_names_match_flight_aliases()
+    print("All flight estimate checks passed")
@@ -11,6 +11,26 @@ load_dotenv()
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Very simple mock translations for demo, by source text and target language
+_MOCK_TRANSLATIONS = {
+    "Hello! How can I help you plan your trip?": {
+        "ES": "¡Hola! ¿Cómo puedo ayudarte a planificar tu viaje?",
+        "FR": "Bonjour! Comment puis-je vous aider à planifier votre voyage?",
+        "DE": "Hallo! Wie kann ich Ihnen bei der Planung Ihrer Reise helfen?",
+        "IT": "Ciao! Come posso aiutarti a pianificare il tuo viaggio?",
+        "JA": "こんにちは！あなたの旅行の計画をどのようにお手伝いできますか？",
+        "ZH": "你好！我能怎样帮助你规划旅行？"
+    },
+    "The Eiffel Tower is a must-visit attraction in Paris.": {
+        "ES": "La Torre Eiffel es una atracción que hay que visitar en París.",
+        "FR": "La Tour Eiffel est une attraction incontournable à Paris.",
+        "DE": "Der Eiffelturm ist eine Sehenswürdigkeit, die man in Paris unbedingt besuchen sollte.",
+        "IT": "La Torre Eiffel è un'attrazione da non perdere a Parigi.",
+        "JA": "エッフェル塔はパリで必見の観光スポットです。",
+        "ZH": "埃菲尔铁塔是巴黎必游的景点。"
+    }
+}
+
 class DeepLTranslateTool(BaseTool):
     name = "deepl_translate"
     description = """
@@ -93,30 +113,10 @@ class DeepLTranslateTool(BaseTool):
         """Generate mock translation for demo purposes."""
         target_language = target_language.upper()
         
-        # Very simple mock translations for demo
-        translations = {
-            "Hello! How can I help you plan your trip?": {
-                "ES": "¡Hola! ¿Cómo puedo ayudarte a planificar tu viaje?",
-                "FR": "Bonjour! Comment puis-je vous aider à planifier votre voyage?",
-                "DE": "Hallo! Wie kann ich Ihnen bei der Planung Ihrer Reise helfen?",
-                "IT": "Ciao! Come posso aiutarti a pianificare il tuo viaggio?",
-                "JA": "こんにちは！あなたの旅行の計画をどのようにお手伝いできますか？",
-                "ZH": "你好！我能怎样帮助你规划旅行？"
-            },
-            "The Eiffel Tower is a must-visit attraction in Paris.": {
-                "ES": "La Torre Eiffel es una atracción que hay que visitar en París.",
-                "FR": "La Tour Eiffel est une attraction incontournable à Paris.",
-                "DE": "Der Eiffelturm ist eine Sehenswürdigkeit, die man in Paris unbedingt besuchen sollte.",
-                "IT": "La Torre Eiffel è un'attrazione da non perdere a Parigi.",
-                "JA": "エッフェル塔はパリで必見の観光スポットです。",
-                "ZH": "埃菲尔铁塔是巴黎必游的景点。"
-            }
-        }
-        
         # Check if we have a mock translation for this text
-        if text in translations:
-            if target_language in translations[text]:
-                return translations[text][target_language]
+        translation = _MOCK_TRANSLATIONS.get(text, {}).get(target_language)
+        if translation is not None:
+            return translation
         
         # If no mock translation available, indicate it's a mock
         return f"[Mock Translation to {target_language}] {text}"
\ No newline at end of file
@@ -1,6 +1,8 @@
 import os
 import json
 import logging
+import threading
+from collections import OrderedDict
 from typing import Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
@@ -12,6 +14,20 @@ load_dotenv()
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Most recent queries whose preprocessing results are kept
+PREPROCESS_CACHE_MAX = 128
+
+# Words in a comparison query that select each transport mode, in listed order
+_TRANSPORT_MODE_KEYWORDS = (
+    ("flight", ("fly", "flight")),
+    ("drive", ("drive", "car")),
+    ("train", ("train",)),
+    ("bus", ("bus",)),
+)
+
+# Airport codes for location names Gemini commonly returns
+_AIRPORT_CODES = {"sf": "SFO", "san francisco": "SFO", "fresno": "FAT", "fres": "FAT"}
+
 class GeminiPreprocessor:
     """
     A preprocessor that uses Gemini to structure natural language travel queries
@@ -31,6 +47,10 @@ class GeminiPreprocessor:
             temperature=0,  # Keep it deterministic for structured outputs
             google_api_key=api_key
         )
+        
+        # Recent results by query, so a message isn't sent to Gemini twice
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
     
     def preprocess_query(self, query: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
@@ -43,6 +63,15 @@ class GeminiPreprocessor:
         Returns:
             A dictionary containing structured data and metadata about the query
         """
+        if context is None:
+            with self._cache_lock:
+                cached = self._cache.get(query)
+                if cached is not None:
+                    self._cache.move_to_end(query)
+            if cached is not None:
+                logger.info(f"Using cached preprocessing for query: {query}")
+                return cached
+        
         logger.info(f"Preprocessing query with Gemini: {query}")
         
         system_prompt = """You are a travel query analyzer that extracts structured information from natural language travel queries.
@@ -59,6 +88,7 @@ class GeminiPreprocessor:
             "query_type": "flight" | "poi" | "directions" | "recommendations" | "general" | "transport_comparison",
             "origin": "location name or empty string if not specified",
             "destination": "location name",
+            "destinations": ["every destination, only when the query names more than one"],
             "date_info": {
                 "start_date": "YYYY-MM-DD or empty string",
                 "end_date": "YYYY-MM-DD or empty string",
@@ -69,6 +99,9 @@ class GeminiPreprocessor:
             "transport_modes": ["flight", "drive", "bus", "train"] (only for transport_comparison queries)
         }
         
+        If a poi or recommendations query asks about several places (like "things to do in Rome and Florence"),
+        list all of them in destinations and put the first one in destination.
+
         If the query is about comparing different transportation methods (like "flights vs driving"), 
         set query_type to "transport_comparison" and list the transport modes in transport_modes array.
 
@@ -122,36 +155,36 @@ class GeminiPreprocessor:
                 structured_data = {"error": "Could not extract structured data"}
                 logger.error(f"Failed to extract JSON from Gemini response: {result}")
                 
-            logger.info(f"Structured data: {json.dumps(structured_data)}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"Structured data: {json.dumps(structured_data)}")
             
             # Add original query to the response
             structured_data["original_query"] = query
             
             # Special case handling for comparison queries
-            if "vs" in query.lower() or "versus" in query.lower() or "or" in query.lower() and ("fly" in query.lower() or "drive" in query.lower()):
+            query_lower = query.lower()
+            if "vs" in query_lower or "versus" in query_lower or "or" in query_lower and ("fly" in query_lower or "drive" in query_lower):
                 if structured_data.get("query_type") != "transport_comparison":
                     structured_data["query_type"] = "transport_comparison"
-                    structured_data["transport_modes"] = []
-                    
-                    if "fly" in query.lower() or "flight" in query.lower():
-                        structured_data["transport_modes"].append("flight")
-                    if "drive" in query.lower() or "car" in query.lower():
-                        structured_data["transport_modes"].append("drive")
-                    if "train" in query.lower():
-                        structured_data["transport_modes"].append("train")
-                    if "bus" in query.lower():
-                        structured_data["transport_modes"].append("bus")
+                    structured_data["transport_modes"] = [
+                        mode for mode, keywords in _TRANSPORT_MODE_KEYWORDS
+                        if any(keyword in query_lower for keyword in keywords)
+                    ]
             
             # Fix airport codes
-            if structured_data.get("origin", "").lower() in ["sf", "san francisco"]:
-                structured_data["origin_code"] = "SFO"
-            elif structured_data.get("origin", "").lower() in ["fresno", "fres"]:
-                structured_data["origin_code"] = "FAT"
+            origin_code = _AIRPORT_CODES.get(structured_data.get("origin", "").lower())
+            if origin_code:
+                structured_data["origin_code"] = origin_code
                 
-            if structured_data.get("destination", "").lower() in ["fresno", "fres"]:
-                structured_data["destination_code"] = "FAT"
-            elif structured_data.get("destination", "").lower() in ["sf", "san francisco"]:
-                structured_data["destination_code"] = "SFO"
+            destination_code = _AIRPORT_CODES.get(structured_data.get("destination", "").lower())
+            if destination_code:
+                structured_data["destination_code"] = destination_code
+            
+            if context is None and "error" not in structured_data:
+                with self._cache_lock:
+                    self._cache[query] = structured_data
+                    if len(self._cache) > PREPROCESS_CACHE_MAX:
+                        self._cache.popitem(last=False)
             
             return structured_data
             
@@ -13,6 +13,95 @@ load_dotenv()
 # Configure logging
 logger = logging.getLogger(__name__)
 
+def _restaurant_script(introduction, service_name, user_name, reservation_details):
+    """Call script for booking a table."""
+    date = reservation_details.get("date", "today")
+    time = reservation_details.get("time", "7:00 PM")
+    num_people = reservation_details.get("num_people", 2)
+    special_requests = reservation_details.get("special_requests", "")
+    
+    script = f"{introduction}\n\n"
+    script += f"Your goal is to make a reservation at {service_name} for {num_people} people on {date} at {time}.\n"
+    if special_requests:
+        script += f"Mention these special requests: {special_requests}\n"
+    script += f"\nThe reservation should be under the name: {user_name}\n"
+    script += "\nIf they ask for a callback number, explain that you're calling on behalf of a client and cannot provide a direct number, but they can reach out to the customer directly."
+    script += "\nAfter making the reservation, confirm the details, including date, time, party size, and ask if there's any deposit required."
+    return script
+
+def _hotel_script(introduction, service_name, user_name, reservation_details):
+    """Call script for booking a hotel room."""
+    check_in = reservation_details.get("date", "")
+    duration = reservation_details.get("duration", "")
+    num_people = reservation_details.get("num_people", 1)
+    special_requests = reservation_details.get("special_requests", "")
+    
+    script = f"{introduction}\n\n"
+    script += f"Your goal is to book a room at {service_name} for {num_people} guest(s).\n"
+    script += f"The check-in date would be {check_in}"
+    if duration:
+        script += f" for a duration of {duration}.\n"
+    else:
+        script += ".\n"
+    if special_requests:
+        script += f"Mention these special requests: {special_requests}\n"
+    script += f"\nThe reservation should be under the name: {user_name}\n"
+    script += "\nConfirm availability, pricing details, and any booking requirements such as deposit or ID required at check-in."
+    return script
+
+def _attraction_script(introduction, service_name, user_name, reservation_details):
+    """Call script for reserving attraction tickets."""
+    date = reservation_details.get("date", "")
+    time = reservation_details.get("time", "")
+    num_people = reservation_details.get("num_people", 1)
+    
+    script = f"{introduction}\n\n"
+    script += f"Your goal is to reserve tickets for {service_name} for {num_people} person(s).\n"
+    if date:
+        script += f"The visit date would be {date}"
+        if time:
+            script += f" at around {time}.\n"
+        else:
+            script += ".\n"
+    script += f"\nThe reservation should be under the name: {user_name}\n"
+    script += "\nConfirm availability, pricing, any booking requirements, and what the tickets include."
+    return script
+
+def _travel_agent_script(introduction, service_name, user_name, reservation_details):
+    """Call script for asking a travel agency about packages."""
+    script = f"{introduction}\n\n"
+    script += f"Your goal is to gather information about travel packages or services from {service_name}.\n"
+    script += "Specifically, ask about:\n"
+    
+    if "destination" in reservation_details:
+        script += f"- Travel to {reservation_details['destination']}\n"
+    if "date" in reservation_details:
+        script += f"- For the date(s): {reservation_details['date']}\n"
+    if "num_people" in reservation_details:
+        script += f"- For {reservation_details['num_people']} person(s)\n"
+    if "special_requests" in reservation_details:
+        script += f"- With these requirements: {reservation_details['special_requests']}\n"
+        
+    script += f"\nMention that you're calling on behalf of {user_name} who is exploring options for an upcoming trip.\n"
+    script += "\nIf they can provide package information, ask about pricing, availability, and booking procedures."
+    return script
+
+def _inquiry_script(introduction, service_name, user_name, reservation_details):
+    """Call script for any other kind of service."""
+    script = f"{introduction}\n\n"
+    script += f"Your goal is to make an inquiry about services at {service_name}.\n"
+    script += f"You're calling on behalf of {user_name}.\n"
+    script += "\nFind out about availability and booking procedures for their services."
+    return script
+
+# Call script builders by service type; anything else gets a general inquiry
+_CALL_SCRIPTS = {
+    "restaurant": _restaurant_script,
+    "hotel": _hotel_script,
+    "attraction": _attraction_script,
+    "travel_agent": _travel_agent_script,
+}
+
 class VapiReservationTool(BaseTool):
     name = "vapi_reservation"
     description = """
@@ -92,8 +181,10 @@ class VapiReservationTool(BaseTool):
             
             # Wait for call completion or timeout
             # For demo purposes, mock the call and return sample result
-            logger.info("Would make Vapi.ai call with the following payload:")
-            logger.info(json.dumps(payload, indent=2))
+            # The payload is only serialized when INFO logging is on
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Would make Vapi.ai call with the following payload:")
+                logger.info(json.dumps(payload, indent=2))
             
             # For demo purposes, return mock response
             mock_response = self._get_mock_reservation_response(params)
@@ -108,95 +199,25 @@ class VapiReservationTool(BaseTool):
     
     def _generate_call_instruction(self, params):
         """Generate appropriate call instructions based on service type."""
-        service_type = params["service_type"]
-        service_name = params["service_name"]
         user_name = params["user_name"]
         reservation_details = params.get("reservation_details", {})
         
         # Base introduction
         introduction = f"You are Voyagent, an AI assistant calling to make a reservation on behalf of {user_name}. Be professional, direct, and friendly. Speak naturally and get the task done efficiently. Make realistic responses to questions. If you can't make a reservation, apologize politely and explain why."
         
-        if service_type == "restaurant":
-            date = reservation_details.get("date", "today")
-            time = reservation_details.get("time", "7:00 PM")
-            num_people = reservation_details.get("num_people", 2)
-            special_requests = reservation_details.get("special_requests", "")
-            
-            script = f"{introduction}\n\n"
-            script += f"Your goal is to make a reservation at {service_name} for {num_people} people on {date} at {time}.\n"
-            if special_requests:
-                script += f"Mention these special requests: {special_requests}\n"
-            script += f"\nThe reservation should be under the name: {user_name}\n"
-            script += "\nIf they ask for a callback number, explain that you're calling on behalf of a client and cannot provide a direct number, but they can reach out to the customer directly."
-            script += "\nAfter making the reservation, confirm the details, including date, time, party size, and ask if there's any deposit required."
-            
-        elif service_type == "hotel":
-            check_in = reservation_details.get("date", "")
-            duration = reservation_details.get("duration", "")
-            num_people = reservation_details.get("num_people", 1)
-            special_requests = reservation_details.get("special_requests", "")
-            
-            script = f"{introduction}\n\n"
-            script += f"Your goal is to book a room at {service_name} for {num_people} guest(s).\n"
-            script += f"The check-in date would be {check_in}"
-            if duration:
-                script += f" for a duration of {duration}.\n"
-            else:
-                script += ".\n"
-            if special_requests:
-                script += f"Mention these special requests: {special_requests}\n"
-            script += f"\nThe reservation should be under the name: {user_name}\n"
-            script += "\nConfirm availability, pricing details, and any booking requirements such as deposit or ID required at check-in."
-            
-        elif service_type == "attraction":
-            date = reservation_details.get("date", "")
-            time = reservation_details.get("time", "")
-            num_people = reservation_details.get("num_people", 1)
-            
-            script = f"{introduction}\n\n"
-            script += f"Your goal is to reserve tickets for {service_name} for {num_people} person(s).\n"
-            if date:
-                script += f"The visit date would be {date}"
-                if time:
-                    script += f" at around {time}.\n"
-                else:
-                    script += ".\n"
-            script += f"\nThe reservation should be under the name: {user_name}\n"
-            script += "\nConfirm availability, pricing, any booking requirements, and what the tickets include."
-            
-        elif service_type == "travel_agent":
-            script = f"{introduction}\n\n"
-            script += f"Your goal is to gather information about travel packages or services from {service_name}.\n"
-            script += "Specifically, ask about:\n"
-            
-            if "destination" in reservation_details:
-                script += f"- Travel to {reservation_details['destination']}\n"
-            if "date" in reservation_details:
-                script += f"- For the date(s): {reservation_details['date']}\n"
-            if "num_people" in reservation_details:
-                script += f"- For {reservation_details['num_people']} person(s)\n"
-            if "special_requests" in reservation_details:
-                script += f"- With these requirements: {reservation_details['special_requests']}\n"
-                
-            script += f"\nMention that you're calling on behalf of {user_name} who is exploring options for an upcoming trip.\n"
-            script += "\nIf they can provide package information, ask about pricing, availability, and booking procedures."
-            
-        else:
-            script = f"{introduction}\n\n"
-            script += f"Your goal is to make an inquiry about services at {service_name}.\n"
-            script += f"You're calling on behalf of {user_name}.\n"
-            script += "\nFind out about availability and booking procedures for their services."
-            
-        return script
+        build_script = _CALL_SCRIPTS.get(params["service_type"], _inquiry_script)
+        return build_script(introduction, params["service_name"], user_name, reservation_details)
     
     def _get_mock_reservation_response(self, params):
         """Generate mock reservation response for demo purposes."""
         service_type = params["service_type"]
         service_name = params["service_name"]
         user_name = params["user_name"]
+        # Shared by every branch, so looked up and formatted once
+        details = params.get("reservation_details", {})
+        reference = f"{hash(service_name + user_name)%10000:04d}"
         
         if service_type == "restaurant":
-            details = params.get("reservation_details", {})
             date = details.get("date", "May 5, 2025")
             time = details.get("time", "7:00 PM")
             num_people = details.get("num_people", 2)
@@ -210,13 +231,12 @@ class VapiReservationTool(BaseTool):
             Number of people: {num_people}
             Reservation name: {user_name}
             
-            Confirmation #: RES-{hash(service_name + user_name)%10000:04d}
+            Confirmation #: RES-{reference}
             
             Call summary: The restaurant confirmed your reservation and requested you arrive 15 minutes before your reservation time. They noted that they may hold the table for only 15 minutes if your party is late.
             """
             
         elif service_type == "hotel":
-            details = params.get("reservation_details", {})
             check_in = details.get("date", "May 10, 2025")
             duration = details.get("duration", "3 nights")
             
@@ -228,13 +248,12 @@ class VapiReservationTool(BaseTool):
             Duration: {duration}
             Guest name: {user_name}
             
-            Confirmation #: HTL-{hash(service_name + user_name)%10000:04d}
+            Confirmation #: HTL-{reference}
             
             Call summary: The hotel confirmed your reservation and provided the following information: Check-in time is after 3:00 PM. They require a credit card to hold the reservation, which will be collected at check-in. Breakfast is included in your stay.
             """
             
         elif service_type == "attraction":
-            details = params.get("reservation_details", {})
             date = details.get("date", "May 12, 2025")
             num_people = details.get("num_people", 2)
             
@@ -246,13 +265,12 @@ class VapiReservationTool(BaseTool):
             Number of tickets: {num_people}
             Reservation name: {user_name}
             
-            Confirmation #: ATT-{hash(service_name + user_name)%10000:04d}
+            Confirmation #: ATT-{reference}
             
             Call summary: The attraction has reserved your tickets. They advised arriving 30 minutes before your scheduled time to collect your tickets from the will-call window. Please bring ID and the credit card used for purchase.
             """
             
         elif service_type == "travel_agent":
-            details = params.get("reservation_details", {})
             destination = details.get("destination", "your destination")
             
             return f"""
@@ -262,7 +280,7 @@ class VapiReservationTool(BaseTool):
             Destination: {destination}
             Inquiry name: {user_name}
             
-            Reference #: TRV-{hash(service_name + user_name)%10000:04d}
+            Reference #: TRV-{reference}
             
             Call summary: The travel agent provided information about available packages for {destination}. They will email detailed options to you within 24 hours. They recommended booking at least 45 days in advance to secure the best rates and availability.
             """
@@ -274,11 +292,26 @@ class VapiReservationTool(BaseTool):
             Service: {service_name}
             Inquiry name: {user_name}
             
-            Reference #: SVC-{hash(service_name + user_name)%10000:04d}
+            Reference #: SVC-{reference}
             
             Call summary: The service has confirmed availability and will hold a spot for you for 24 hours. They request that you call back directly to finalize your booking with payment details.
             """
 
+def _format_transcript(transcript):
+    """Label each speaker in a call transcript for better readability."""
+    parts = ["📞 Call Transcript:\n\n"]
+    for line in transcript.split('\n'):
+        if line.strip():
+            # Add speaker labels and formatting
+            if line.startswith('Assistant:'):
+                parts.append(f"🤖 {line}\n")
+            elif line.startswith('Customer:'):
+                parts.append(f"👤 {line}\n")
+            else:
+                parts.append(f"{line}\n")
+    # Joined once instead of re-copying the growing transcript for every line
+    return "".join(parts)
+
 class VapiCallTool(BaseTool):
     name = "vapi_call"
     description = """
@@ -385,21 +418,7 @@ Keep the conversation focused on completing the reservation."""
                             if status in ["completed", "failed", "expired"]:
                                 if status == "completed" and "transcript" in status_data:
                                     # Format the transcript for better readability
-                                    transcript = status_data["transcript"]
-                                    formatted_transcript = "📞 Call Transcript:\n\n"
-                                    
-                                    # Split transcript into lines and format each line
-                                    for line in transcript.split('\n'):
-                                        if line.strip():
-                                            # Add speaker labels and formatting
-                                            if line.startswith('Assistant:'):
-                                                formatted_transcript += f"🤖 {line}\n"
-                                            elif line.startswith('Customer:'):
-                                                formatted_transcript += f"👤 {line}\n"
-                                            else:
-                                                formatted_transcript += f"{line}\n"
-                                    
-                                    return formatted_transcript
+                                    return _format_transcript(status_data["transcript"])
                                 else:
                                     return f"Call {status}. No transcript available."
                             break
@@ -93,7 +93,9 @@ def index():
 @app.route('/webhook', methods=['POST'])
 def webhook():
     data = request.get_json()
-    logger.info(f"Received update: {json.dumps(data, indent=2)}")
+    # Skip pretty-printing every update when INFO logging is off
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(f"Received update: {json.dumps(data, indent=2)}")
     
     # Check if this is a message or command
     if 'message' in data: